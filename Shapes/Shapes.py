@@ -2,6 +2,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.widgets import Button
 import random
+from spiral_engine import generate_spiral, theta_grid
 
 def plot_spiral(ax, color_map='viridis'):
     ax.clear()  # Clear current axes
@@ -10,10 +11,8 @@ def plot_spiral(ax, color_map='viridis'):
     random_multiplier = random.randint(1, 10)
 
     # Generating the data
-    theta = np.linspace(0, 4 * np.pi, 10000)
-    r = np.sin(random_multiplier * theta) * np.exp(-theta/10)
-    x = r * np.cos(theta)
-    y = r * np.sin(theta)
+    theta = theta_grid(0, 4 * np.pi, 10000)
+    x, y = generate_spiral(random_multiplier, theta_stop=4 * np.pi, points=10000)
 
     # Plotting the graph
     split_size = len(theta) // 100
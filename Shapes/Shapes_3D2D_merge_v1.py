@@ -1,4 +1,3 @@
-import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.widgets import Button, Slider, RadioButtons, CheckButtons
 from matplotlib.colors import ListedColormap
@@ -8,6 +7,9 @@ import random
 from colorsys import hls_to_rgb
 from PyQt5.QtWidgets import QFileDialog, QApplication
 import pickle
+from spiral_engine import as_precision, generate_spiral, z_grid
+from spiral_atlas import load_atlas
+from spiral_render import RotateProxy
 
 # Global states
 TRACE_ENABLED = False
@@ -23,6 +25,7 @@ LAST_THETA = 0
 PAUSE_POSITION = None
 DARK_MODE = False
 IS_3D = True  # Initial state
+ATLAS = load_atlas()
 
 def get_complementary_colors():
     h = random.random()
@@ -41,26 +44,14 @@ def plot_spiral(ax, continue_from=None):
         ALL_PLOTS = []
 
     random_multiplier = random.randint(1, 100)
-    theta = np.linspace(0 if not continue_from else continue_from, 8 * np.pi, 20000)
-
-    if SHAPE_INFLUENCE == 'circle':
-        r = np.sin(random_multiplier * theta)
-    elif SHAPE_INFLUENCE == 'square':
-        r = np.sign(np.sin(random_multiplier * theta))
-    elif SHAPE_INFLUENCE == 'triangle':
-        r = np.abs(np.sin(random_multiplier * theta))
-    else:
-        r = np.sin(random_multiplier * theta) * np.exp(-theta / 10)
-
-    x = r * np.cos(theta)
-    y = r * np.sin(theta)
+    x, y = generate_spiral(random_multiplier, SHAPE_INFLUENCE, theta_start=continue_from or 0, atlas=ATLAS)
 
     colors = CURRENT_COLORS if CURRENT_COLORS else get_complementary_colors()
     CURRENT_COLORS = colors
     DATA_TO_UNDO = []
 
     if IS_3D:
-        z = np.linspace(0, 10, len(theta))
+        z = z_grid(len(x))
         segments = len(x) // 100
         for i in range(0 if not PAUSE_POSITION else PAUSE_POSITION, len(x), segments):
             if not PLOTTING_ENABLED:
@@ -93,6 +84,28 @@ def plot_spiral(ax, continue_from=None):
     ax.axis('off')
     plt.draw()
 
+def reproject_pattern(ax):
+    # Draw the current pattern from LAST_DATA on the new axes at once, with
+    # z from the shared grid in 3D, instead of generating a new one
+    global LAST_DATA, DATA_TO_UNDO, ALL_PLOTS
+    x, y = LAST_DATA[:2]
+    z = z_grid(len(x)) if IS_3D else None
+    LAST_DATA = (x, y, z) if IS_3D else (x, y)
+    ALL_PLOTS = []
+    DATA_TO_UNDO = []
+    stop = PAUSE_POSITION if not PLOTTING_ENABLED and PAUSE_POSITION else len(x)
+    segments = len(x) // 100
+    for i in range(0, stop, segments):
+        segment_end = i + segments if i + segments < len(x) else len(x)
+        data = (x[i:segment_end], y[i:segment_end]) + ((z[i:segment_end],) if IS_3D else ())
+        if DATA_POINTS_ENABLED:
+            line, = ax.plot(*data, 'o', color=CURRENT_COLORS[int(3 * i / len(x))], markersize=1)
+        else:
+            line, = ax.plot(*data, color=CURRENT_COLORS[int(3 * i / len(x))])
+        ALL_PLOTS.append(line)
+        DATA_TO_UNDO.append(line)
+    ax.axis('off')
+
 def update_color_button(event):
     global CURRENT_COLORS
     CURRENT_COLORS = get_complementary_colors()
@@ -178,7 +191,7 @@ def save_data(event):
         with open(filename, 'wb') as f:
             pickle.dump({
                 'plots': ALL_PLOTS,
-                'last_data': LAST_DATA,
+                'last_data': as_precision(LAST_DATA),
                 'colors': CURRENT_COLORS
             }, f)
     app.quit()
@@ -194,20 +207,22 @@ def load_data(event):
             for plot in ALL_PLOTS:
                 plot.remove()
             ALL_PLOTS = data['plots']
-            LAST_DATA = data['last_data']
+            LAST_DATA = as_precision(data['last_data'])
             CURRENT_COLORS = data['colors']
             plot_spiral(ax)
     app.quit()
 
 def on_slider_val_change(val):
+    if LAST_DATA is None:
+        return
     factor = 1 / slider.val
     if IS_3D:
-        ax.set_xlim(min(LAST_DATA[0]) * factor, max(LAST_DATA[0]) * factor)
-        ax.set_ylim(min(LAST_DATA[1]) * factor, max(LAST_DATA[1]) * factor)
-        ax.set_zlim(min(LAST_DATA[2]) * factor, max(LAST_DATA[2]) * factor)
+        ax.set_xlim(LAST_DATA[0].min() * factor, LAST_DATA[0].max() * factor)
+        ax.set_ylim(LAST_DATA[1].min() * factor, LAST_DATA[1].max() * factor)
+        ax.set_zlim(LAST_DATA[2].min() * factor, LAST_DATA[2].max() * factor)
     else:
-        ax.set_xlim(min(LAST_DATA[0]) * factor, max(LAST_DATA[0]) * factor)
-        ax.set_ylim(min(LAST_DATA[1]) * factor, max(LAST_DATA[1]) * factor)
+        ax.set_xlim(LAST_DATA[0].min() * factor, LAST_DATA[0].max() * factor)
+        ax.set_ylim(LAST_DATA[1].min() * factor, LAST_DATA[1].max() * factor)
     plt.draw()
 
 def shape_influence(label):
@@ -235,7 +250,10 @@ def toggle_dimension(event):
         ax = fig.add_subplot(gs[0])
         toggle_dim_button.label.set_text('Switch to 3D')
     ax.axis('off')
-    plot_spiral(ax)
+    if LAST_DATA is None:
+        plot_spiral(ax)
+    else:
+        reproject_pattern(ax)
     fig.canvas.draw()
 
 number_of_buttons = 12
@@ -246,6 +264,7 @@ button_positions = [button_spacing + i * (button_width + button_spacing) for i i
 # Create figure and axes
 gs = GridSpec(3, 1, height_ratios=[1, 0.1, 0.1])
 fig = plt.figure(figsize=(10, 7))
+rotate_proxy = RotateProxy(fig)  # decimated stand-in while a 3D view is dragged
 ax = fig.add_subplot(gs[0], projection='3d')
 ax.axis('off')
 fig.set_facecolor('white')
@@ -8,6 +8,12 @@ import random
 from colorsys import hls_to_rgb
 from PyQt5.QtWidgets import QFileDialog, QApplication
 import pickle
+from spiral_engine import (THETA_STEP, THETA_STOP, Z_STOP, adaptive_theta, as_precision, generate_on_basis,
+                           generate_spiral, generate_window, iter_spiral, pattern_basis, stream_points, theta_basis,
+                           z_grid)
+from spiral_atlas import load_atlas
+from spiral_render import DeepZoom, ProjectedCollection, RefreshThrottle, RotateProxy, union_bounds
+from spiral_session import PatternPrefetcher, SpiralSession
 
 # Global states
 TRACE_ENABLED = False
@@ -18,11 +24,30 @@ LAST_DATA = None
 CURRENT_COLORS = []
 DATA_TO_UNDO = []
 ALL_PLOTS = []
+SESSION = SpiralSession()
+PREFETCH_DEPTH = 2  # patterns computed ahead on a worker thread; 0 disables prefetching
+STREAM_GENERATION = False  # generate each pattern on a worker thread, streaming vertices into the plot
+STREAM_CHUNK = 2048
+REPLAY_ON_SWITCH = False  # replay the animation after switching 2D/3D instead of showing the pattern at once
+INCREMENTAL_INFLUENCE = True  # a shape change redraws the current pattern in place instead of starting a new one
+LAST_MULTIPLIER = None
+LAST_BASIS = None  # theta grid of the current pattern with its cos/sin, reused by shape changes
+LOCKED_BOUNDS = None  # (min, max) per axis of the patterns kept on the axes by LOCK PATTERN
+FAST_3D_PROJECTION = True  # project all locked 3D patterns together, in one collection
+LOCKED_LAYERS = None
+DEEP_ZOOM_ENABLED = True  # when zoomed in, regenerate the part of the pattern in view at a matching density
+DEEP_ZOOM = None
+DENSITY_MODE = False  # bin a long stream of each pattern into one 2D image instead of drawing its vertices
+DENSITY_POINTS = 200000000
+DENSITY_CHUNK = 2 ** 18
+DENSITY_BOUNDS = [(-1, 1), (-1, 1)]
 SHAPE_INFLUENCE = None
 LAST_THETA = 0
-PAUSE_POSITION = None
 DARK_MODE = False
 IS_3D = True  # Initial state
+ATLAS = load_atlas()
+# Sample each pattern as densely as its curvature needs, unless a prebuilt atlas can serve it
+ADAPTIVE_SAMPLING = ATLAS is None
 
 def get_complementary_colors():
     h = random.random()
@@ -34,64 +59,130 @@ def get_complementary_colors():
         colors.append(rgb)
     return colors
 
+def generate_pattern(multiplier, shape, theta_start=0):
+    # Always with its z so switching dimension can reuse it, and with the
+    # basis it was sampled on so a shape change can reuse that
+    if ADAPTIVE_SAMPLING:
+        basis = pattern_basis(adaptive_theta(multiplier, shape, theta_start=theta_start), theta_start, dtype=np.float64)
+        return generate_on_basis(basis, multiplier, shape, is_3d=True), basis
+    return (generate_spiral(multiplier, shape, theta_start=theta_start, is_3d=True, atlas=ATLAS),
+            theta_basis(theta_start))
+
+def make_pattern(settings):
+    # Runs on the prefetch thread: one random pattern, its basis and colors
+    shape, theta_start = settings
+    random_multiplier = random.randint(1, 100)
+    pattern, basis = generate_pattern(random_multiplier, shape, theta_start)
+    return pattern, basis, get_complementary_colors(), random_multiplier
+
+def detach_deep_zoom():
+    global DEEP_ZOOM
+    if DEEP_ZOOM is not None:
+        DEEP_ZOOM.remove()
+        DEEP_ZOOM = None
+
+def lock_layer(pattern):
+    # Moves a locked pattern into LOCKED_LAYERS, projected in one step with
+    # every other locked pattern instead of as an artist of its own
+    global LOCKED_LAYERS
+    detach_deep_zoom()
+    if LOCKED_LAYERS is None:
+        LOCKED_LAYERS = ProjectedCollection()
+        ax.add_collection(LOCKED_LAYERS, autolim=False)
+        ALL_PLOTS.append(LOCKED_LAYERS)
+    LOCKED_LAYERS.add(*pattern.polylines())
+    for artist in pattern.artists:
+        if artist in ALL_PLOTS:
+            ALL_PLOTS.remove(artist)
+    pattern.remove()
+
+def attach_deep_zoom():
+    # Deep zoom follows the current pattern; locked patterns and dot trails
+    # stay at base density, since the refined tiles are drawn as lines
+    global DEEP_ZOOM
+    detach_deep_zoom()
+    pattern = SESSION.pattern
+    if not DEEP_ZOOM_ENABLED or pattern is None or pattern.dotted or LAST_BASIS is None or LAST_MULTIPLIER is None:
+        return
+    multiplier, shape, is_3d = LAST_MULTIPLIER, SHAPE_INFLUENCE, IS_3D
+
+    def generate(theta_start, theta_stop, points):
+        return generate_window(multiplier, shape, theta_start=theta_start, theta_stop=theta_stop, points=points,
+                               is_3d=is_3d)
+    DEEP_ZOOM = DeepZoom(pattern, LAST_BASIS.theta, generate)
+
+def update_deep_zoom():
+    if DEEP_ZOOM is not None and DEEP_ZOOM.update():
+        fig.canvas.draw_idle()
+
+def finish_pattern(animation):
+    report_fps(animation)
+    update_deep_zoom()
+
+def report_fps(animation):
+    print("pattern drawn: %d frames at %.1f fps (%.1f ms per frame, %d dropped); prefetch %d hits, %d misses" % (
+        animation.frames, animation.fps, 1000 * animation.frame_time, animation.scheduler.dropped,
+        PREFETCH.hits, PREFETCH.misses))
+
+def report_density(task):
+    accumulator = task.accumulator
+    print("density drawn: %d points in %.1f s (%.1f M points/s)" % (
+        accumulator.points, accumulator.elapsed, accumulator.points / max(accumulator.elapsed, 1e-9) / 1e6))
+
+def plot_density(ax):
+    # The pattern sampled DENSITY_POINTS times and binned on a worker thread;
+    # with LOCK PATTERN its counts add onto the previous pattern's image
+    global ALL_PLOTS
+    chunks = iter_spiral(LAST_MULTIPLIER, SHAPE_INFLUENCE, theta_stop=THETA_STOP,
+                         step=THETA_STOP / (DENSITY_POINTS - 1), chunk=DENSITY_CHUNK)
+    task = SESSION.density(ax, chunks, DENSITY_BOUNDS, CURRENT_COLORS, accumulate=RECORD_ENABLED,
+                           play=PLOTTING_ENABLED, on_finish=report_density)
+    ALL_PLOTS = [plot for plot in ALL_PLOTS if plot.axes is not None]
+    return task
+
 def plot_spiral(ax, continue_from=None):
-    global LAST_DATA, CURRENT_COLORS, DATA_TO_UNDO, ALL_PLOTS, SHAPE_INFLUENCE, LAST_THETA, PAUSE_POSITION, IS_3D
+    global LAST_DATA, CURRENT_COLORS, DATA_TO_UNDO, ALL_PLOTS, SHAPE_INFLUENCE, LAST_THETA, IS_3D, LAST_MULTIPLIER
+    global LOCKED_BOUNDS, LOCKED_LAYERS, LAST_BASIS
+    SESSION.cancel()
     if not RECORD_ENABLED:
         ax.clear()
         ALL_PLOTS = []
+        LOCKED_BOUNDS = LOCKED_LAYERS = None
+    elif SESSION.pattern is not None and SESSION.pattern.ax is ax:
+        LOCKED_BOUNDS = union_bounds(LOCKED_BOUNDS, SESSION.pattern.bounds)
+        if FAST_3D_PROJECTION and IS_3D and not SESSION.pattern.dotted:
+            lock_layer(SESSION.pattern)
 
-    random_multiplier = random.randint(1, 100)
-    theta = np.linspace(0 if not continue_from else continue_from, 8 * np.pi, 20000)
-
-    if SHAPE_INFLUENCE == 'circle':
-        r = np.sin(random_multiplier * theta)
-    elif SHAPE_INFLUENCE == 'square':
-        r = np.sign(np.sin(random_multiplier * theta))
-    elif SHAPE_INFLUENCE == 'triangle':
-        r = np.abs(np.sin(random_multiplier * theta))
-    else:
-        r = np.sin(random_multiplier * theta) * np.exp(-theta / 10)
-
-    x = r * np.cos(theta)
-    y = r * np.sin(theta)
-
-    colors = CURRENT_COLORS if CURRENT_COLORS else get_complementary_colors()
-    CURRENT_COLORS = colors
     DATA_TO_UNDO = []
-
-    if IS_3D:
-        z = np.linspace(0, 10, len(theta))
-        segments = len(x) // 100
-        for i in range(0 if not PAUSE_POSITION else PAUSE_POSITION, len(x), segments):
-            if not PLOTTING_ENABLED:
-                PAUSE_POSITION = i
-                break
-            segment_end = i + segments if i + segments < len(x) else len(x)
-            if DATA_POINTS_ENABLED:
-                line, = ax.plot(x[i:segment_end], y[i:segment_end], z[i:segment_end], 'o', color=colors[int(3 * i / len(x))], markersize=1)
-            else:
-                line, = ax.plot(x[i:segment_end], y[i:segment_end], z[i:segment_end], color=colors[int(3 * i / len(x))])
-            ALL_PLOTS.append(line)
-            DATA_TO_UNDO.append(line)
-            plt.pause(0.02)
-        LAST_DATA = (x, y, z)
-    else:
-        segments = len(x) // 100
-        for i in range(0 if not PAUSE_POSITION else PAUSE_POSITION, len(x), segments):
-            if not PLOTTING_ENABLED:
-                PAUSE_POSITION = i
-                break
-            segment_end = i + segments if i + segments < len(x) else len(x)
-            if DATA_POINTS_ENABLED:
-                line, = ax.plot(x[i:segment_end], y[i:segment_end], 'o', color=colors[int(3 * i / len(x))], markersize=1)
-            else:
-                line, = ax.plot(x[i:segment_end], y[i:segment_end], color=colors[int(3 * i / len(x))])
-            ALL_PLOTS.append(line)
-            DATA_TO_UNDO.append(line)
-            plt.pause(0.02)
-        LAST_DATA = (x, y)
     ax.axis('off')
-    plt.draw()
+    if DENSITY_MODE:
+        CURRENT_COLORS = CURRENT_COLORS or get_complementary_colors()
+        LAST_MULTIPLIER = random.randint(1, 100)
+        LAST_DATA = LAST_BASIS = None
+        task = plot_density(ax)
+    elif STREAM_GENERATION:
+        CURRENT_COLORS = CURRENT_COLORS or get_complementary_colors()
+        theta_start = continue_from or 0
+        LAST_MULTIPLIER = random.randint(1, 100)
+        chunks = iter_spiral(LAST_MULTIPLIER, SHAPE_INFLUENCE, theta_start=theta_start, theta_stop=THETA_STOP,
+                             chunk=STREAM_CHUNK, is_3d=IS_3D)
+        bounds = [(-1, 1), (-1, 1), (0, Z_STOP)] if IS_3D else [(-1, 1), (-1, 1)]
+        task = SESSION.stream(ax, chunks, stream_points(theta_start, THETA_STOP), bounds, CURRENT_COLORS,
+                              dotted=DATA_POINTS_ENABLED, play=PLOTTING_ENABLED, on_frame=DATA_TO_UNDO.append,
+                              on_finish=finish_pattern)
+        LAST_DATA = tuple(task.pattern.points.T)
+        LAST_BASIS = pattern_basis(theta_start + np.arange(len(task.pattern)) * THETA_STEP, theta_start,
+                                   theta_start + THETA_STOP)
+    else:
+        pattern, LAST_BASIS, next_colors, LAST_MULTIPLIER = PREFETCH.take((SHAPE_INFLUENCE, continue_from or 0))
+        CURRENT_COLORS = CURRENT_COLORS or next_colors
+        LAST_DATA = pattern
+        task = SESSION.draw(ax, pattern if IS_3D else pattern[:2], CURRENT_COLORS, dotted=DATA_POINTS_ENABLED,
+                            play=PLOTTING_ENABLED, on_frame=DATA_TO_UNDO.append, on_finish=finish_pattern)
+    ALL_PLOTS.extend(task.image.artists if DENSITY_MODE else task.pattern.artists)
+    attach_deep_zoom()
+    if not PLOTTING_ENABLED:
+        plt.draw()
 
 def update_color_button(event):
     global CURRENT_COLORS
@@ -101,10 +192,9 @@ def update_color_button(event):
     fig.canvas.draw()
 
 def next_pattern(event):
-    global PLOTTING_ENABLED, DATA_TO_UNDO, PAUSE_POSITION
+    global PLOTTING_ENABLED, DATA_TO_UNDO
     DATA_TO_UNDO = []
     PLOTTING_ENABLED = True
-    PAUSE_POSITION = None
     plot_spiral(ax)
 
 def trace(event):
@@ -132,31 +222,36 @@ def stop_plotting(event):
     global PLOTTING_ENABLED
     PLOTTING_ENABLED = not PLOTTING_ENABLED
     if not PLOTTING_ENABLED:
+        SESSION.pause()
         stop_button.label.set_text('RESUME')
     else:
         stop_button.label.set_text('STOP')
-        plot_spiral(ax, continue_from=LAST_THETA)
+        if not SESSION.resume():
+            plot_spiral(ax, continue_from=LAST_THETA)
     fig.canvas.draw()
 
 def undo(event):
     if DATA_TO_UNDO:
-        removed = DATA_TO_UNDO.pop()
-        if removed in ax.get_children():
-            removed.remove()
+        SESSION.pattern.reveal(DATA_TO_UNDO.pop())
+        if DEEP_ZOOM is not None:
+            DEEP_ZOOM.update()
         plt.draw()
 
 def reset(event):
-    global TRACE_ENABLED, RECORD_ENABLED, DATA_POINTS_ENABLED, PLOTTING_ENABLED, LAST_DATA, CURRENT_COLORS, ALL_PLOTS, PAUSE_POSITION
+    global TRACE_ENABLED, RECORD_ENABLED, DATA_POINTS_ENABLED, PLOTTING_ENABLED, LAST_DATA, CURRENT_COLORS, ALL_PLOTS
+    global LOCKED_BOUNDS, LOCKED_LAYERS, LAST_BASIS
+    SESSION.cancel()
+    detach_deep_zoom()
+    LOCKED_BOUNDS = LOCKED_LAYERS = None
     TRACE_ENABLED = False
     RECORD_ENABLED = False
     DATA_POINTS_ENABLED = False
     PLOTTING_ENABLED = True
-    LAST_DATA = None
+    LAST_DATA = LAST_BASIS = None
     CURRENT_COLORS = []
     for plot in ALL_PLOTS:
         plot.remove()
     ALL_PLOTS = []
-    PAUSE_POSITION = None
     ax.clear()
     ax.axis('off')
     plt.draw()
@@ -177,7 +272,7 @@ def save_data(event):
         with open(filename, 'wb') as f:
             pickle.dump({
                 'plots': ALL_PLOTS,
-                'last_data': LAST_DATA,
+                'last_data': as_precision(LAST_DATA),
                 'colors': CURRENT_COLORS
             }, f)
     app.quit()
@@ -193,28 +288,51 @@ def load_data(event):
             for plot in ALL_PLOTS:
                 plot.remove()
             ALL_PLOTS = data['plots']
-            LAST_DATA = data['last_data']
+            LAST_DATA = as_precision(data['last_data'])
             CURRENT_COLORS = data['colors']
             plot_spiral(ax)
     app.quit()
 
 def on_slider_val_change(val):
-    factor = 1 / slider.val
+    # Runs at most once per refresh (see zoom_throttle) on bounds cached when
+    # each pattern was built, so a tick never scans the vertices
+    if LAST_DATA is None or SESSION.pattern is None:
+        return
+    factor = 1 / val
+    bounds = union_bounds(LOCKED_BOUNDS, SESSION.pattern.bounds) * factor
+    ax.set_xlim(*bounds[0])
+    ax.set_ylim(*bounds[1])
     if IS_3D:
-        ax.set_xlim(min(LAST_DATA[0]) * factor, max(LAST_DATA[0]) * factor)
-        ax.set_ylim(min(LAST_DATA[1]) * factor, max(LAST_DATA[1]) * factor)
-        ax.set_zlim(min(LAST_DATA[2]) * factor, max(LAST_DATA[2]) * factor)
-    else:
-        ax.set_xlim(min(LAST_DATA[0]) * factor, max(LAST_DATA[0]) * factor)
-        ax.set_ylim(min(LAST_DATA[1]) * factor, max(LAST_DATA[1]) * factor)
-    plt.draw()
+        ax.set_zlim(*bounds[2])
+    if DEEP_ZOOM is not None:
+        DEEP_ZOOM.update()
+    fig.canvas.draw_idle()
 
 def shape_influence(label):
     global SHAPE_INFLUENCE
     SHAPE_INFLUENCE = label if SHAPE_INFLUENCE != label else None
     if SHAPE_INFLUENCE is None:
         shape_buttons.set_active(-1)
-    plot_spiral(ax)
+    pattern = SESSION.pattern
+    if (INCREMENTAL_INFLUENCE and pattern is not None and LAST_BASIS is not None and LAST_MULTIPLIER is not None
+            and pattern.filled == len(pattern)):
+        reshape_pattern(pattern)
+    else:
+        plot_spiral(ax)
+
+def reshape_pattern(pattern):
+    # Same multiplier and theta grid under the new shape: only the radius is
+    # recomputed (cos/sin come from LAST_BASIS), in the session's workspace,
+    # and the existing artists take the new vertices, so the change lands in
+    # one frame at the same point of the animation
+    global LAST_DATA
+    SESSION.reshape(LAST_BASIS, LAST_MULTIPLIER, SHAPE_INFLUENCE)
+    LAST_DATA = tuple(pattern.points.T[:2]) + (LAST_BASIS.z.astype(pattern.points.dtype, copy=False),)
+    PREFETCH.prefetch((SHAPE_INFLUENCE, 0))
+    attach_deep_zoom()
+    update_deep_zoom()
+    if not SESSION.running:
+        fig.canvas.draw_idle()
 
 def toggle_dark_mode(label):
     global DARK_MODE
@@ -223,9 +341,28 @@ def toggle_dark_mode(label):
     ax.set_facecolor('black' if DARK_MODE else 'white')
     fig.canvas.draw()
 
+def toggle_density(label):
+    global DENSITY_MODE
+    DENSITY_MODE = not DENSITY_MODE
+    if DENSITY_MODE and IS_3D:
+        toggle_dimension(None)
+    else:
+        plot_spiral(ax)
+        fig.canvas.draw_idle()
+
 def toggle_dimension(event):
-    global IS_3D, ax
+    # Reprojects the current pattern from LAST_DATA instead of generating a new one
+    global IS_3D, ax, LAST_DATA, ALL_PLOTS, LOCKED_BOUNDS, LOCKED_LAYERS, DENSITY_MODE
+    if DENSITY_MODE and not IS_3D:
+        # Density images are 2D only, so switching to 3D leaves density mode
+        DENSITY_MODE = False
+        density_check.eventson = False
+        density_check.set_active(0)
+        density_check.eventson = True
     IS_3D = not IS_3D
+    LOCKED_BOUNDS = LOCKED_LAYERS = None
+    previous, was_running = SESSION.task, SESSION.running
+    SESSION.cancel()
     ax.remove()
     if IS_3D:
         ax = fig.add_subplot(gs[0], projection='3d')
@@ -234,9 +371,23 @@ def toggle_dimension(event):
         ax = fig.add_subplot(gs[0])
         toggle_dim_button.label.set_text('Switch\n to 3D')
     ax.axis('off')
-    plot_spiral(ax)
+    if DENSITY_MODE or LAST_DATA is None or previous is None or previous.pattern.filled < len(previous.pattern):
+        plot_spiral(ax)
+    else:
+        if len(LAST_DATA) == 2:
+            LAST_DATA = (LAST_DATA[0], LAST_DATA[1], z_grid(len(LAST_DATA[0])))
+        replay = REPLAY_ON_SWITCH and PLOTTING_ENABLED
+        task = SESSION.draw(ax, LAST_DATA if IS_3D else LAST_DATA[:2], CURRENT_COLORS, dotted=previous.pattern.dotted,
+                            start=0 if replay else previous.pattern.count, play=replay or was_running,
+                            on_frame=DATA_TO_UNDO.append, on_finish=finish_pattern)
+        ALL_PLOTS = list(task.pattern.artists)
+        attach_deep_zoom()
     fig.canvas.draw()
 
+# Start computing the first patterns while the window is built
+PREFETCH = PatternPrefetcher(make_pattern, 0 if STREAM_GENERATION else PREFETCH_DEPTH)
+PREFETCH.prefetch((SHAPE_INFLUENCE, 0))
+
 number_of_buttons = 12
 button_width = 0.07
 button_spacing = (0.9 - number_of_buttons * button_width) / (number_of_buttons + 1)
@@ -245,6 +396,7 @@ button_positions = [button_spacing + i * (button_width + button_spacing) for i i
 # Create figure and axes
 gs = GridSpec(3, 1, height_ratios=[1, 0.1, 0.1])
 fig = plt.figure(figsize=(10, 7))
+rotate_proxy = RotateProxy(fig)  # decimated stand-in while a 3D view is dragged
 ax = fig.add_subplot(gs[0], projection='3d')
 ax.axis('off')
 fig.set_facecolor('white')
@@ -299,7 +451,8 @@ print_button.on_clicked(print_plot)
 
 slider_ax = plt.axes([0.91, 0.15, 0.015, 0.7])
 slider = Slider(slider_ax, 'Zoom', 0.1, 2.0, valinit=1.0, orientation='vertical')
-slider.on_changed(on_slider_val_change)
+zoom_throttle = RefreshThrottle(fig.canvas, on_slider_val_change)
+slider.on_changed(zoom_throttle)
 
 CURRENT_COLORS = get_complementary_colors()
 for i in range(3):
@@ -314,6 +467,9 @@ shape_buttons.on_clicked(shape_influence)
 dark_mode_check = CheckButtons(plt.axes([0.01, 0.85, 0.2, 0.1]), ['Dark Mode'], [False])
 dark_mode_check.on_clicked(toggle_dark_mode)
 
+density_check = CheckButtons(plt.axes([0.01, 0.64, 0.2, 0.1]), ['Density'], [DENSITY_MODE])
+density_check.on_clicked(toggle_density)
+
 plot_spiral(ax)
 plt.show()
 
@@ -5,6 +5,7 @@ from matplotlib.colors import ListedColormap
 from matplotlib.gridspec import GridSpec
 import random
 from colorsys import hls_to_rgb
+from spiral_engine import generate_spiral, theta_grid
 
 # Global states
 TRACE_ENABLED = False
@@ -31,10 +32,8 @@ def plot_spiral(ax):
         ax.clear()
 
     random_multiplier = random.randint(1, 100)
-    theta = np.linspace(0, 8 * np.pi, 20000)
-    r = np.sin(random_multiplier * theta) * np.exp(-theta / 10)
-    x = r * np.cos(theta)
-    y = r * np.sin(theta)
+    theta = theta_grid()
+    x, y = generate_spiral(random_multiplier)
 
     colors = CURRENT_COLORS if CURRENT_COLORS else get_complementary_colors()
     CURRENT_COLORS = colors
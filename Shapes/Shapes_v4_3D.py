@@ -1,4 +1,3 @@
-import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.widgets import Button
 from matplotlib.colors import ListedColormap
@@ -6,6 +5,7 @@ from matplotlib.gridspec import GridSpec
 from mpl_toolkits.mplot3d import Axes3D
 import random
 from colorsys import hls_to_rgb
+from spiral_engine import generate_spiral
 from PyQt5.QtWidgets import QFileDialog, QApplication
 
 # Global states
@@ -33,11 +33,7 @@ def plot_spiral(ax):
         ax.clear()
 
     random_multiplier = random.randint(1, 100)
-    theta = np.linspace(0, 8 * np.pi, 20000)
-    r = np.sin(random_multiplier * theta) * np.exp(-theta / 10)
-    x = r * np.cos(theta)
-    y = r * np.sin(theta)
-    z = np.linspace(0, 10, len(theta))
+    x, y, z = generate_spiral(random_multiplier, is_3d=True)
 
     colors = CURRENT_COLORS if CURRENT_COLORS else get_complementary_colors()
     CURRENT_COLORS = colors
@@ -1,4 +1,3 @@
-import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.widgets import Button, Slider
 from matplotlib.colors import ListedColormap
@@ -6,6 +5,8 @@ from matplotlib.gridspec import GridSpec
 from mpl_toolkits.mplot3d import Axes3D
 import random
 from colorsys import hls_to_rgb
+from spiral_engine import as_precision, generate_spiral
+from spiral_render import RotateProxy
 from PyQt5.QtWidgets import QFileDialog, QApplication
 import pickle
 
@@ -36,11 +37,7 @@ def plot_spiral(ax):
         ALL_PLOTS = []
 
     random_multiplier = random.randint(1, 100)
-    theta = np.linspace(0, 8 * np.pi, 20000)
-    r = np.sin(random_multiplier * theta) * np.exp(-theta / 10)
-    x = r * np.cos(theta)
-    y = r * np.sin(theta)
-    z = np.linspace(0, 10, len(theta))
+    x, y, z = generate_spiral(random_multiplier, is_3d=True)
 
     colors = CURRENT_COLORS if CURRENT_COLORS else get_complementary_colors()
     CURRENT_COLORS = colors
@@ -147,7 +144,7 @@ def save_data(event):
         with open(filename, 'wb') as f:
             pickle.dump({
                 'plots': ALL_PLOTS,
-                'last_data': LAST_DATA,
+                'last_data': as_precision(LAST_DATA),
                 'colors': CURRENT_COLORS
             }, f)
     app.quit()
@@ -163,16 +160,18 @@ def load_data(event):
             for plot in ALL_PLOTS:
                 plot.remove()
             ALL_PLOTS = data['plots']
-            LAST_DATA = data['last_data']
+            LAST_DATA = as_precision(data['last_data'])
             CURRENT_COLORS = data['colors']
             plot_spiral(ax)
     app.quit()
 
 def on_slider_val_change(val):
+    if LAST_DATA is None:
+        return
     factor = 1 / slider.val
-    ax.set_xlim(min(LAST_DATA[0]) * factor, max(LAST_DATA[0]) * factor)
-    ax.set_ylim(min(LAST_DATA[1]) * factor, max(LAST_DATA[1]) * factor)
-    ax.set_zlim(min(LAST_DATA[2]) * factor, max(LAST_DATA[2]) * factor)
+    ax.set_xlim(LAST_DATA[0].min() * factor, LAST_DATA[0].max() * factor)
+    ax.set_ylim(LAST_DATA[1].min() * factor, LAST_DATA[1].max() * factor)
+    ax.set_zlim(LAST_DATA[2].min() * factor, LAST_DATA[2].max() * factor)
     plt.draw()
 
 number_of_buttons = 11
@@ -183,6 +182,7 @@ button_positions = [button_spacing + i * (button_width + button_spacing) for i i
 # Create figure and axes
 gs = GridSpec(2, 1, height_ratios=[1, 0.1])
 fig = plt.figure(figsize=(10, 7))
+rotate_proxy = RotateProxy(fig)  # decimated stand-in while a 3D view is dragged
 ax = fig.add_subplot(gs[0], projection='3d')
 ax.axis('off')
 
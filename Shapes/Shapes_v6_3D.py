@@ -1,4 +1,3 @@
-import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.widgets import Button, Slider, RadioButtons, CheckButtons
 from matplotlib.colors import ListedColormap
@@ -8,6 +7,9 @@ import random
 from colorsys import hls_to_rgb
 from PyQt5.QtWidgets import QFileDialog, QApplication
 import pickle
+from spiral_engine import as_precision, generate_spiral
+from spiral_atlas import load_atlas
+from spiral_render import RotateProxy
 
 # Global states
 TRACE_ENABLED = False
@@ -20,8 +22,14 @@ DATA_TO_REDO = []
 ALL_PLOTS = []
 SHAPE_INFLUENCE = None
 AXIS_INFLUENCE = "spiral"
+INCREMENTAL_INFLUENCE = True  # an influence change redraws the current pattern in place instead of starting a new one
+LAST_MULTIPLIER = None
+LAST_AXIS_MULTIPLIER = None
+LAST_THETA_START = 0
+LAST_SEGMENTS = []
 LAST_POSITION = None
 DARK_MODE = False
+ATLAS = load_atlas()
 
 def get_complementary_colors():
     h = random.random()
@@ -33,40 +41,50 @@ def get_complementary_colors():
         colors.append(rgb)
     return colors
 
-def get_axis_multiplier(theta):
-    if AXIS_INFLUENCE == "spiral":
-        return theta
-    elif AXIS_INFLUENCE == "random":
-        return np.sin(random.randint(1, 100) * theta)
-    return theta
+def get_axis_multiplier():
+    if AXIS_INFLUENCE == "random":
+        return random.randint(1, 100)
+    return None
+
+def can_reshape():
+    return (INCREMENTAL_INFLUENCE and PLOTTING_ENABLED and LAST_DATA is not None
+            and LAST_MULTIPLIER is not None and LAST_SEGMENTS)
+
+def reshape_pattern():
+    # Same multiplier (and axis multiplier) on the same theta grid under the
+    # new influence: an atlas lookup or, on the cached theta basis, only the
+    # radius is recomputed, and the drawn segments take the new vertices
+    # instead of a new pattern being animated
+    global LAST_DATA
+    axis_multiplier = LAST_AXIS_MULTIPLIER if AXIS_INFLUENCE == "random" else None
+    x, y, z = generate_spiral(LAST_MULTIPLIER, SHAPE_INFLUENCE, AXIS_INFLUENCE, axis_multiplier,
+                              theta_start=LAST_THETA_START, is_3d=True, atlas=ATLAS)
+    for line, start, end in LAST_SEGMENTS:
+        line.set_data_3d(x[start:end], y[start:end], z[start:end])
+    ax.set_xlim(x.min(), x.max())
+    ax.set_ylim(y.min(), y.max())
+    ax.set_zlim(z.min(), z.max())
+    LAST_DATA = (x, y, z)
+    plt.draw()
 
 def plot_spiral(ax, continue_from=None):
     global LAST_DATA, CURRENT_COLORS, DATA_TO_REDO, ALL_PLOTS, SHAPE_INFLUENCE, AXIS_INFLUENCE, LAST_POSITION
+    global LAST_MULTIPLIER, LAST_AXIS_MULTIPLIER, LAST_THETA_START, LAST_SEGMENTS
 
     if not RECORD_ENABLED:
         ax.clear()
         ALL_PLOTS = []
 
     random_multiplier = random.randint(1, 100)
-    theta = np.linspace(0 if not continue_from else continue_from, 8 * np.pi, 20000)
-    axis_multiplier = get_axis_multiplier(theta)
-
-    if SHAPE_INFLUENCE == 'circle':
-        r = np.sin(random_multiplier * axis_multiplier)
-    elif SHAPE_INFLUENCE == 'square':
-        r = np.sign(np.sin(random_multiplier * axis_multiplier))
-    elif SHAPE_INFLUENCE == 'triangle':
-        r = np.abs(np.sin(random_multiplier * axis_multiplier))
-    else:
-        r = np.sin(random_multiplier * axis_multiplier) * np.exp(-theta / 10)
-
-    x = r * np.cos(theta)
-    y = r * np.sin(theta)
-    z = np.linspace(0, 10, len(theta))
+    axis_multiplier = get_axis_multiplier()
+    x, y, z = generate_spiral(random_multiplier, SHAPE_INFLUENCE, AXIS_INFLUENCE, axis_multiplier,
+                              theta_start=continue_from or 0, is_3d=True, atlas=ATLAS)
+    LAST_MULTIPLIER, LAST_AXIS_MULTIPLIER, LAST_THETA_START = random_multiplier, axis_multiplier, continue_from or 0
 
     colors = CURRENT_COLORS if CURRENT_COLORS else get_complementary_colors()
     CURRENT_COLORS = colors
     DATA_TO_REDO = []
+    LAST_SEGMENTS = []
 
     segments = len(x) // 100
     for i in range(0 if not LAST_POSITION else LAST_POSITION, len(x), segments):
@@ -80,6 +98,7 @@ def plot_spiral(ax, continue_from=None):
             line, = ax.plot(x[i:segment_end], y[i:segment_end], z[i:segment_end], color=colors[int(3 * i/len(x))])
         ALL_PLOTS.append(line)
         DATA_TO_REDO.append(line)
+        LAST_SEGMENTS.append((line, i, segment_end))
         plt.pause(0.02)
 
     ax.set_xlim(min(x), max(x))
@@ -173,7 +192,7 @@ def save_data(event):
         with open(filename, 'wb') as f:
             pickle.dump({
                 'plots': ALL_PLOTS,
-                'last_data': LAST_DATA,
+                'last_data': as_precision(LAST_DATA),
                 'colors': CURRENT_COLORS
             }, f)
     app.quit()
@@ -189,16 +208,18 @@ def load_data(event):
             for plot in ALL_PLOTS:
                 plot.remove()
             ALL_PLOTS = data['plots']
-            LAST_DATA = data['last_data']
+            LAST_DATA = as_precision(data['last_data'])
             CURRENT_COLORS = data['colors']
             plot_spiral(ax)
     app.quit()
 
 def on_slider_val_change(val):
+    if LAST_DATA is None:
+        return
     factor = 1 / slider.val
-    ax.set_xlim(min(LAST_DATA[0]) * factor, max(LAST_DATA[0]) * factor)
-    ax.set_ylim(min(LAST_DATA[1]) * factor, max(LAST_DATA[1]) * factor)
-    ax.set_zlim(min(LAST_DATA[2]) * factor, max(LAST_DATA[2]) * factor)
+    ax.set_xlim(LAST_DATA[0].min() * factor, LAST_DATA[0].max() * factor)
+    ax.set_ylim(LAST_DATA[1].min() * factor, LAST_DATA[1].max() * factor)
+    ax.set_zlim(LAST_DATA[2].min() * factor, LAST_DATA[2].max() * factor)
     plt.draw()
 
 def shape_influence(label):
@@ -206,7 +227,10 @@ def shape_influence(label):
     SHAPE_INFLUENCE = label if SHAPE_INFLUENCE != label else None
     if SHAPE_INFLUENCE is None:
         shape_buttons.set_active(-1)
-    plot_spiral(ax)
+    if can_reshape():
+        reshape_pattern()
+    else:
+        plot_spiral(ax)
 
 def toggle_dark_mode(label):
     global DARK_MODE
@@ -216,13 +240,21 @@ def toggle_dark_mode(label):
     fig.canvas.draw()
 
 def toggle_axis_influence(label):
-    global AXIS_INFLUENCE
+    global AXIS_INFLUENCE, LAST_AXIS_MULTIPLIER
     AXIS_INFLUENCE = label if AXIS_INFLUENCE != label else "spiral"
+    # set_active() fires on_clicked again; keep it from re-entering
+    axis_buttons.eventson = False
     if AXIS_INFLUENCE == "spiral":
         axis_buttons.set_active(0)
     else:
         axis_buttons.set_active(1)
-    plot_spiral(ax)
+    axis_buttons.eventson = True
+    if can_reshape():
+        if AXIS_INFLUENCE == "random" and LAST_AXIS_MULTIPLIER is None:
+            LAST_AXIS_MULTIPLIER = get_axis_multiplier()
+        reshape_pattern()
+    else:
+        plot_spiral(ax)
 
 number_of_buttons = 11
 button_width = 0.07
@@ -232,6 +264,7 @@ button_positions = [button_spacing + i * (button_width + button_spacing) for i i
 # Create figure and axes
 gs = GridSpec(4, 1, height_ratios=[1, 0.1, 0.1, 0.1])
 fig = plt.figure(figsize=(10, 7))
+rotate_proxy = RotateProxy(fig)  # decimated stand-in while a 3D view is dragged
 ax = fig.add_subplot(gs[0], projection='3d')
 ax.axis('off')
 fig.set_facecolor('white')
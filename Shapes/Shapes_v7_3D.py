@@ -1,4 +1,3 @@
-import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.widgets import Button, Slider, RadioButtons, CheckButtons
 from matplotlib.colors import ListedColormap
@@ -8,6 +7,9 @@ import random
 from colorsys import hls_to_rgb
 from PyQt5.QtWidgets import QFileDialog, QApplication
 import pickle
+from spiral_engine import THETA_STOP, as_precision, generate_spiral, z_grid
+from spiral_atlas import load_atlas
+from spiral_render import RotateProxy
 
 # Global states
 TRACE_ENABLED = False
@@ -22,6 +24,7 @@ SHAPE_INFLUENCE = None
 LAST_THETA = 0
 PAUSE_POSITION = None
 DARK_MODE = False
+ATLAS = load_atlas()
 
 def get_complementary_colors():
     h = random.random()
@@ -40,20 +43,8 @@ def plot_spiral(ax, continue_from=None):
         ALL_PLOTS = []
 
     random_multiplier = random.randint(1, 100)
-    theta = np.linspace(0 if not continue_from else continue_from, 8 * np.pi, 20000)
-
-    if SHAPE_INFLUENCE == 'circle':
-        r = np.sin(random_multiplier * theta)
-    elif SHAPE_INFLUENCE == 'square':
-        r = np.sign(np.sin(random_multiplier * theta))
-    elif SHAPE_INFLUENCE == 'triangle':
-        r = np.abs(np.sin(random_multiplier * theta))
-    else:
-        r = np.sin(random_multiplier * theta) * np.exp(-theta / 10)
-
-    x = r * np.cos(theta)
-    y = r * np.sin(theta)
-    z = np.linspace(0, 10, len(theta))
+    x, y = generate_spiral(random_multiplier, SHAPE_INFLUENCE, theta_start=continue_from or 0, atlas=ATLAS)
+    z = z_grid(len(x))
 
     colors = CURRENT_COLORS if CURRENT_COLORS else get_complementary_colors()
     CURRENT_COLORS = colors
@@ -79,7 +70,7 @@ def plot_spiral(ax, continue_from=None):
     ax.axis('off')
 
     LAST_DATA = (x, y, z)
-    LAST_THETA = theta[-1]
+    LAST_THETA = THETA_STOP
     plt.draw()
 
 def update_color_button(event):
@@ -165,7 +156,7 @@ def save_data(event):
         with open(filename, 'wb') as f:
             pickle.dump({
                 'plots': ALL_PLOTS,
-                'last_data': LAST_DATA,
+                'last_data': as_precision(LAST_DATA),
                 'colors': CURRENT_COLORS
             }, f)
     app.quit()
@@ -181,16 +172,18 @@ def load_data(event):
             for plot in ALL_PLOTS:
                 plot.remove()
             ALL_PLOTS = data['plots']
-            LAST_DATA = data['last_data']
+            LAST_DATA = as_precision(data['last_data'])
             CURRENT_COLORS = data['colors']
             plot_spiral(ax)
     app.quit()
 
 def on_slider_val_change(val):
+    if LAST_DATA is None:
+        return
     factor = 1 / slider.val
-    ax.set_xlim(min(LAST_DATA[0]) * factor, max(LAST_DATA[0]) * factor)
-    ax.set_ylim(min(LAST_DATA[1]) * factor, max(LAST_DATA[1]) * factor)
-    ax.set_zlim(min(LAST_DATA[2]) * factor, max(LAST_DATA[2]) * factor)
+    ax.set_xlim(LAST_DATA[0].min() * factor, LAST_DATA[0].max() * factor)
+    ax.set_ylim(LAST_DATA[1].min() * factor, LAST_DATA[1].max() * factor)
+    ax.set_zlim(LAST_DATA[2].min() * factor, LAST_DATA[2].max() * factor)
     plt.draw()
 
 def shape_influence(label):
@@ -215,6 +208,7 @@ button_positions = [button_spacing + i * (button_width + button_spacing) for i i
 # Create figure and axes
 gs = GridSpec(3, 1, height_ratios=[1, 0.1, 0.1])
 fig = plt.figure(figsize=(10, 7))
+rotate_proxy = RotateProxy(fig)  # decimated stand-in while a 3D view is dragged
 ax = fig.add_subplot(gs[0], projection='3d')
 ax.axis('off')
 fig.set_facecolor('white')
@@ -0,0 +1,123 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+import spiral_engine
+
+ATLAS_DIR = os.path.join(spiral_engine.CACHE_DIR, 'atlas') if spiral_engine.CACHE_DIR else None
+ATLAS_DATA = 'patterns.npy'
+ATLAS_INDEX = 'index.json'
+
+
+def atlas_keys(axis_influences=('spiral',)):
+    # Every (shape, axis, multiplier, axis multiplier) the scripts can draw.
+    # 2D and 3D share x/y; z always comes from the cached theta basis.
+    low, high = spiral_engine.MULTIPLIER_RANGE
+    keys = []
+    for axis_influence in axis_influences:
+        axis_multipliers = range(low, high + 1) if axis_influence == 'random' else [None]
+        for axis_multiplier in axis_multipliers:
+            for shape in spiral_engine.SHAPE_INFLUENCES:
+                for multiplier in range(low, high + 1):
+                    keys.append((shape, axis_influence, multiplier, axis_multiplier))
+    return keys
+
+
+def build_atlas(path=ATLAS_DIR, axis_influences=('spiral',), dtype=np.float32,
+                points=spiral_engine.POINTS, max_bytes=spiral_engine.BATCH_MEMORY_CAP):
+    """Generate every pattern once into path/patterns.npy plus path/index.json.
+
+    The 'spiral' axis covers 400 patterns (64 MB as float32); adding the
+    'random' axis multiplies that by its 100 axis multipliers.
+    """
+    keys = atlas_keys(axis_influences)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    build_dir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(path)))
+    data = np.lib.format.open_memmap(os.path.join(build_dir, ATLAS_DATA), mode='w+', dtype=dtype,
+                                     shape=(len(keys), 2, points))
+    start = 0
+    for axis_influence in axis_influences:
+        block = [key for key in keys if key[1] == axis_influence]
+        for offset, x, y in spiral_engine.iter_batch(
+                [key[2] for key in block], [key[0] for key in block], axis_influence,
+                [key[3] for key in block] if axis_influence == 'random' else None,
+                points=points, max_bytes=max_bytes):
+            data[start + offset:start + offset + len(x), 0] = x
+            data[start + offset:start + offset + len(y), 1] = y
+        start += len(block)
+    data.flush()
+    del data
+    with open(os.path.join(build_dir, ATLAS_INDEX), 'w') as f:
+        json.dump({
+            'theta_start': spiral_engine.THETA_START,
+            'theta_stop': spiral_engine.THETA_STOP,
+            'points': points,
+            'dtype': np.dtype(dtype).name,
+            'keys': keys,
+        }, f)
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.replace(build_dir, path)
+    return PatternAtlas(path)
+
+
+class PatternAtlas:
+    """Read-only, memory-mapped store of prebuilt patterns."""
+
+    def __init__(self, path):
+        with open(os.path.join(path, ATLAS_INDEX)) as f:
+            index = json.load(f)
+        self.path = path
+        self.theta_start = index['theta_start']
+        self.theta_stop = index['theta_stop']
+        self.points = index['points']
+        self.rows = {tuple(key): row for row, key in enumerate(index['keys'])}
+        self.data = np.asarray(np.load(os.path.join(path, ATLAS_DATA), mmap_mode='r'))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def lookup(self, multiplier, shape_influence=None, axis_influence='spiral', axis_multiplier=None,
+               theta_start=spiral_engine.THETA_START, theta_stop=spiral_engine.THETA_STOP,
+               points=spiral_engine.POINTS):
+        # Returns read-only (x, y) views, or None when the atlas cannot serve the request
+        if (theta_start, theta_stop, points) != (self.theta_start, self.theta_stop, self.points):
+            return None
+        if axis_influence is None:
+            axis_influence = 'spiral'
+        row = self.rows.get((shape_influence, axis_influence, multiplier,
+                             axis_multiplier if axis_influence == 'random' else None))
+        if row is None:
+            return None
+        return self.data[row, 0], self.data[row, 1]
+
+
+def load_atlas(path=ATLAS_DIR):
+    # None when no atlas has been built yet, so callers fall back to generating
+    if path and os.path.exists(os.path.join(path, ATLAS_INDEX)):
+        return PatternAtlas(path)
+    return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build or inspect the precomputed pattern atlas")
+    parser.add_argument('command', choices=['build', 'info'])
+    parser.add_argument('--path', default=ATLAS_DIR, help="atlas directory (default: %(default)s)")
+    parser.add_argument('--axis', nargs='+', default=['spiral'], choices=spiral_engine.AXIS_INFLUENCES,
+                        help="axis influences to include (default: spiral)")
+    parser.add_argument('--dtype', default='float32', choices=['float32', 'float64'])
+    args = parser.parse_args()
+    if not args.path:
+        parser.error("no atlas path: pass --path or set SHAPES_CACHE_DIR")
+    if args.command == 'build':
+        atlas = build_atlas(args.path, tuple(args.axis), np.dtype(args.dtype))
+    else:
+        atlas = load_atlas(args.path)
+        if atlas is None:
+            parser.error("no atlas at %s; run 'python spiral_atlas.py build' first" % args.path)
+    print("%d patterns, %s, %.1f MB at %s" % (len(atlas), atlas.data.dtype,
+                                              atlas.data.nbytes / 1e6, atlas.path))
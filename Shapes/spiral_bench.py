@@ -0,0 +1,903 @@
+import argparse
+import random
+import time
+import tracemalloc
+
+import numpy as np
+
+import spiral_engine
+
+
+def timed(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def plot_spiral_math(multiplier, shape_influence=None):
+    # The per-pattern math as every script's plot_spiral used to run it
+    theta = np.linspace(0, 8 * np.pi, 20000)
+    r = spiral_engine.spiral_radius(theta, multiplier, shape_influence)
+    return r * np.cos(theta), r * np.sin(theta)
+
+
+def bench_batch(count=1000):
+    multipliers = [random.randint(*spiral_engine.MULTIPLIER_RANGE) for _ in range(count)]
+    shapes = [random.choice(spiral_engine.SHAPE_INFLUENCES) for _ in range(count)]
+    out = (np.empty((count, spiral_engine.POINTS)), np.empty((count, spiral_engine.POINTS)))
+    out32 = tuple(array.astype(np.float32) for array in out)
+
+    loop = timed(lambda: [plot_spiral_math(m, s) for m, s in zip(multipliers, shapes)])
+    batch = timed(lambda: spiral_engine.generate_batch(multipliers, shapes))
+    reused = timed(lambda: spiral_engine.generate_batch(multipliers, shapes, out=out))
+    batch32 = timed(lambda: spiral_engine.generate_batch(multipliers, shapes, dtype=np.float32))
+    reused32 = timed(lambda: spiral_engine.generate_batch(multipliers, shapes, out=out32, dtype=np.float32))
+
+    x, y = out
+    for i in range(0, count, max(1, count // 20)):
+        expected = plot_spiral_math(multipliers[i], shapes[i])
+        assert np.allclose(x[i], expected[0]) and np.allclose(y[i], expected[1])
+
+    axis_multipliers = [random.randint(*spiral_engine.MULTIPLIER_RANGE) for _ in range(20)]
+    for axis in spiral_engine.AXIS_KERNELS:
+        x, y = spiral_engine.generate_batch(multipliers[:20], shapes[:20], axis, axis_multipliers)
+        for i in range(20):
+            expected = spiral_engine.generate_spiral(multipliers[i], shapes[i], axis, axis_multipliers[i])
+            assert np.allclose(x[i], expected[0]) and np.allclose(y[i], expected[1])
+
+    print("batch of %d patterns" % count)
+    print("  python loop      %8.3f s" % loop)
+    print("  generate_batch   %8.3f s  (%.1fx)" % (batch, loop / batch))
+    print("  with out=buffers %8.3f s  (%.1fx)" % (reused, loop / reused))
+    print("  float32          %8.3f s  (%.1fx)" % (batch32, loop / batch32))
+    print("  float32, out=    %8.3f s  (%.1fx)" % (reused32, loop / reused32))
+    # An order of magnitude over the loop for N >= 1000. A cold float64 call
+    # also pays the page faults of its fresh 2 x N x 160 kB output.
+    if count >= 1000:
+        assert loop / reused >= 10 and loop / batch32 >= 10, "generate_batch is under 10x the loop"
+
+
+def bench_theta_basis(count=200):
+    def cold():
+        for _ in range(count):
+            spiral_engine.clear_theta_basis()
+            spiral_engine.generate_spiral(random.randint(1, 100), is_3d=True)
+
+    def warm():
+        for _ in range(count):
+            spiral_engine.generate_spiral(random.randint(1, 100), is_3d=True)
+
+    uncached = timed(cold)
+    spiral_engine.clear_theta_basis()
+    cached = timed(warm)
+    print("theta basis cache, %d patterns" % count)
+    print("  rebuilt every call %8.3f s" % uncached)
+    print("  cached             %8.3f s  (%.1fx)" % (cached, uncached / cached))
+    print("  %s" % (spiral_engine.theta_basis_info(),))
+
+
+def bench_harmonics(count=1000):
+    multipliers = [random.randint(*spiral_engine.MULTIPLIER_RANGE) for _ in range(count)]
+    theta = spiral_engine.theta_grid()
+    spiral_engine.harmonic_table()
+
+    direct = timed(lambda: [np.sin(m * theta) for m in multipliers])
+    lookup = timed(lambda: [spiral_engine.harmonic_sin(m) for m in multipliers])
+    error = max(np.abs(spiral_engine.harmonic_sin(m) - np.sin(m * theta)).max() for m in set(multipliers))
+    print("harmonic table, %d sin(k*theta) rows" % count)
+    print("  np.sin        %8.3f s" % direct)
+    print("  row lookup    %8.3f s  (%.1fx)" % (lookup, direct / lookup))
+    print("  max abs error %8.1e" % error)
+
+
+def bench_kernels(count=200):
+    # Every registered kernel alone, then each composition fused into one buffer
+    basis = spiral_engine.theta_basis()
+    out = np.empty_like(basis.theta)
+    wave = np.sin(37 * basis.theta)
+    print("influence kernels, %d calls on %d points" % (count, len(out)))
+    for name, kernel in spiral_engine.AXIS_KERNELS.items():
+        elapsed = timed(lambda: [kernel(out, basis.theta, 37, 13) for _ in range(count)])
+        print("  axis  %-10s %8.3f ms" % (name, 1000 * elapsed / count))
+    for name, kernel in spiral_engine.SHAPE_KERNELS.items():
+        elapsed = timed(lambda: [kernel(wave, basis.theta, out, basis.decay) for _ in range(count)])
+        print("  shape %-10s %8.3f ms" % (name, 1000 * elapsed / count))
+    for axis in spiral_engine.AXIS_KERNELS:
+        for shape in spiral_engine.SHAPE_KERNELS:
+            radius = spiral_engine.compose(shape, axis)
+            fused = timed(lambda: [radius(out, basis.theta, 37, 13, basis.decay) for _ in range(count)])
+            separate = timed(lambda: [spiral_engine.shape_radius(spiral_engine.sine_wave(basis.theta, 37, axis, 13),
+                                                                 basis.theta, shape) for _ in range(count)])
+            print("  %-10s o %-6s fused %6.3f ms, unfused %6.3f ms" % (shape, axis, 1000 * fused / count,
+                                                                       1000 * separate / count))
+
+
+def render_pattern(x, y, figsize=(10, 7), dpi=100):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=figsize, dpi=dpi)
+    ax.plot(x, y, linewidth=1)
+    ax.axis('off')
+    ax.set_xlim(-1.05, 1.05)
+    ax.set_ylim(-1.05, 1.05)
+    fig.canvas.draw()
+    pixels = ax.transData.transform(np.column_stack([x, y]).astype(np.float64))
+    image = np.asarray(fig.canvas.buffer_rgba()).copy()
+    plt.close(fig)
+    return pixels, image
+
+
+def bench_render(patterns=10, is_3d=False):
+    # Draw time with LOCK PATTERN on: 100 Line2D artists per pattern versus
+    # one growing PatternCollection per pattern
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from spiral_render import PatternCollection
+
+    data = [spiral_engine.generate_spiral(random.randint(1, 100), is_3d=is_3d) for _ in range(patterns)]
+    colors = ['tab:red', 'tab:green', 'tab:blue']
+
+    def draw_time(add_pattern):
+        fig = plt.figure(figsize=(10, 7))
+        ax = fig.add_subplot(projection='3d' if is_3d else None)
+        for pattern in data:
+            add_pattern(ax, pattern)
+        fig.canvas.draw()
+        elapsed = timed(fig.canvas.draw)
+        artists = len(ax.get_children())
+        plt.close(fig)
+        return elapsed, artists
+
+    def per_segment(ax, pattern):
+        step = len(pattern[0]) // 100
+        for i in range(0, len(pattern[0]), step):
+            ax.plot(*(array[i:i + step] for array in pattern), color=colors[int(3 * i / len(pattern[0]))])
+
+    def collection(ax, pattern):
+        PatternCollection(ax, pattern, colors).reveal(len(pattern[0]))
+
+    old, old_artists = draw_time(per_segment)
+    new, new_artists = draw_time(collection)
+    print("redraw with %d locked %s patterns" % (patterns, '3D' if is_3d else '2D'))
+    print("  ax.plot per segment  %8.3f s  (%d artists)" % (old, old_artists))
+    print("  PatternCollection    %8.3f s  (%d artists, %.1fx)" % (new, new_artists, old / new))
+
+
+def lod_error(screen, keep):
+    # Largest pixel distance from a vertex to the decimated polyline
+    index = np.arange(len(screen))
+    segment = np.clip(np.searchsorted(keep, index, 'right') - 1, 0, len(keep) - 2)
+    start, stop = screen[keep[segment]], screen[keep[segment + 1]]
+    direction, offset = stop - start, screen - start
+    t = np.clip((offset * direction).sum(axis=1) / np.maximum((direction * direction).sum(axis=1), 1e-12), 0, 1)
+    return np.linalg.norm(offset - t[:, None] * direction, axis=1).max()
+
+
+def bench_lod(patterns=10, is_3d=True, rotations=10):
+    # Redraw and rotate time of locked patterns drawn with every vertex
+    # versus decimated to screen resolution
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from spiral_render import LOD_TOLERANCE, PatternCollection
+
+    data = [spiral_engine.generate_spiral(random.randint(1, 100), random.choice(spiral_engine.SHAPE_INFLUENCES),
+                                          is_3d=is_3d) for _ in range(patterns)]
+
+    def draw_time(lod_tolerance):
+        fig = plt.figure(figsize=(10, 7))
+        ax = fig.add_subplot(projection='3d' if is_3d else None)
+        collections = [PatternCollection(ax, pattern, ['r', 'g', 'b'], lod_tolerance=lod_tolerance)
+                       for pattern in data]
+        for pattern in collections:
+            pattern.reveal(len(pattern))
+        fig.canvas.draw()
+        vertices = sum(len(segment) for pattern in collections for segment in pattern.artists[0].get_segments())
+        redraw = timed(fig.canvas.draw)
+
+        def rotate():
+            for step in range(rotations):
+                ax.view_init(elev=30, azim=-60 + 10 * step) if is_3d else None
+                fig.canvas.draw()
+
+        rotation = timed(rotate, 1) / rotations
+        errors = [lod_error(pattern.points * pattern.lod_key, pattern.lod) for pattern in collections
+                  if pattern.lod is not None]
+        plt.close(fig)
+        return redraw, rotation, vertices, max(errors) if errors else 0.0
+
+    full = draw_time(None)
+    lod = draw_time(LOD_TOLERANCE)
+    print("%d locked %s patterns, %d vertices" % (patterns, '3D' if is_3d else '2D', full[2]))
+    print("  every vertex       redraw %7.1f ms, %s %7.1f ms" % (1000 * full[0], 'rotate' if is_3d else 'redraw',
+                                                                  1000 * full[1]))
+    print("  screen resolution  redraw %7.1f ms, %s %7.1f ms  (%d vertices, %.2f px max error)" % (
+        1000 * lod[0], 'rotate' if is_3d else 'redraw', 1000 * lod[1], lod[2], lod[3]))
+    assert lod[3] <= 2 * LOD_TOLERANCE
+
+
+def bench_deep_zoom(zooms=(2, 8, 32, 128), multiplier=37):
+    # Zooming a finished 2D pattern (adaptive grid, as the scripts draw it)
+    # in on one spot and back out: the longest facet on screen at base
+    # density versus with DeepZoom, the vertices it draws, and its update
+    # time cold and from the tile cache. Every refined vertex must keep
+    # the color of the pattern vertex it lies on.
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from spiral_render import DeepZoom, PatternCollection
+
+    fig = plt.figure(figsize=(10, 7))
+    ax = fig.add_subplot()
+    x, y, z = spiral_engine.generate_adaptive(multiplier, is_3d=True)
+    colors = ['r', 'g', 'b']
+    pattern = PatternCollection(ax, (x, y), colors, lod_tolerance=None)
+    pattern.reveal(len(pattern))
+    theta = z * (spiral_engine.THETA_STOP / spiral_engine.Z_STOP)
+    vertex_colors = np.repeat(np.arange(len(colors)), [stop - start for start, stop in pattern.bands])
+    deep_zoom = DeepZoom(pattern, theta, lambda start, stop, points: spiral_engine.generate_window(
+        multiplier, theta_start=start, theta_stop=stop, points=points))
+    centre = np.array([x[len(x) // 3], y[len(y) // 3]])
+
+    def longest_facet(polylines):
+        pixels = [ax.transData.transform(polyline) for polyline in polylines]
+        return max(np.linalg.norm(np.diff(p, axis=0), axis=1).max() for p in pixels if len(p) > 1)
+
+    def in_view(points):
+        (x0, x1), (y0, y1) = ax.get_xlim(), ax.get_ylim()
+        keep = (points[:, 0] >= x0) & (points[:, 0] <= x1) & (points[:, 1] >= y0) & (points[:, 1] <= y1)
+        keep[1:] |= keep[:-1]
+        return [points[keep]]
+
+    def wrong_colors():
+        # Refined segments colored unlike the pattern vertex at their middle theta
+        level, tiles = deep_zoom.shown
+        width = (theta[-1] - theta[0]) / (deep_zoom.tiles << level)
+        segments = iter(zip(deep_zoom.collection.get_segments(), deep_zoom.collection.get_colors()))
+        wrong = 0
+        for tile in tiles:
+            tile_theta = np.linspace(theta[0] + tile * width, theta[0] + (tile + 1) * width, deep_zoom.tile_points)
+            first = 0
+            while first < len(tile_theta) - 1:
+                segment, color = next(segments)
+                # The facet it lies on, by its first vertex
+                vertex = np.searchsorted(theta, tile_theta[first + len(segment) // 2], side='right') - 1
+                wrong += not np.allclose(matplotlib.colors.to_rgba(colors[vertex_colors[vertex]]), color)
+                first += len(segment) - 1
+        return wrong
+
+    print("deep zoom on a %d-vertex 2D pattern" % len(pattern))
+    print("  %6s %14s %14s %10s %10s %10s %8s" % ('zoom', 'base facet px', 'deep facet px', 'vertices', 'cold ms',
+                                                  'cached ms', 'recolor'))
+    for zoom in zooms:
+        ax.set_xlim(centre[0] - 1 / zoom, centre[0] + 1 / zoom)
+        ax.set_ylim(centre[1] - 1 / zoom, centre[1] + 1 / zoom)
+        start = time.perf_counter()
+        deep_zoom.update()
+        cold = time.perf_counter() - start
+        segments = deep_zoom.collection.get_segments()
+        wrong = wrong_colors()
+        base = longest_facet(in_view(pattern.points))
+        deep = longest_facet([segment for segment in segments if len(in_view(segment)[0])])
+
+        def redraw():
+            deep_zoom.shown = None
+            deep_zoom.update()
+
+        cached = timed(redraw)
+        print("  %5dx %14.1f %14.1f %10d %10.1f %10.2f %8d" % (zoom, base, deep, sum(map(len, segments)),
+                                                                 1000 * cold, 1000 * cached, wrong))
+        assert deep < base and wrong == 0
+    plt.close(fig)
+
+
+def bench_projection(patterns=24, views=5):
+    # Locked 3D patterns as 100 Line3D artists each (how the 3D scripts
+    # draw), one Line3DCollection each (PatternCollection) and all in one
+    # ProjectedCollection: projection and draw time per view change, and
+    # the projected vertices compared at a few views
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from spiral_render import PatternCollection, ProjectedCollection
+
+    data = [spiral_engine.generate_spiral(random.randint(1, 100), is_3d=True) for _ in range(patterns)]
+    colors = ['tab:red', 'tab:green', 'tab:blue']
+
+    def view_time(add_patterns):
+        fig = plt.figure(figsize=(10, 7))
+        ax = fig.add_subplot(projection='3d')
+        ax.axis('off')
+        collections = add_patterns(ax)
+        fig.canvas.draw()
+
+        def project():
+            if not collections:
+                return
+            for view in range(views):
+                ax.view_init(elev=30, azim=-60 + 5 * view)
+                ax.M = ax.get_proj()
+                for collection in collections:
+                    collection.do_3d_projection()
+
+        def draw():
+            for view in range(views):
+                ax.view_init(elev=30, azim=-60 + 5 * view)
+                fig.canvas.draw()
+
+        projection, redraw = timed(project) / views, timed(draw, 1) / views
+        segments = []
+        for elev, azim, roll, zoom in ((30, -60, 0, 1), (10, 45, 20, 2.5), (-40, 200, 0, 0.7)):
+            ax.view_init(elev, azim, roll)
+            ax.set_box_aspect(None, zoom=zoom)
+            fig.canvas.draw()
+            if collections:
+                segments.append(np.concatenate([np.concatenate(c.get_segments()) for c in collections]))
+        plt.close(fig)
+        return projection, redraw, segments
+
+    def per_segment(ax):
+        for x, y, z in data:
+            for i in range(0, len(x), len(x) // 100):
+                ax.plot(x[i:i + 201], y[i:i + 201], z[i:i + 201], color=colors[int(3 * i / len(x))])
+        return []
+
+    def separate(ax):
+        collections = []
+        for pattern in data:
+            pattern = PatternCollection(ax, pattern, colors, lod_tolerance=None)
+            pattern.reveal(len(pattern))
+            collections += pattern.artists
+        return collections
+
+    def together(ax):
+        collection = ProjectedCollection(lod_tolerance=None)
+        for pattern in data:
+            pattern = PatternCollection(ax, pattern, colors, lod_tolerance=None)
+            pattern.reveal(len(pattern))
+            collection.add(*pattern.polylines())
+            pattern.remove()
+        ax.add_collection(collection, autolim=False)
+        return [collection]
+
+    lines = view_time(per_segment)
+    old = view_time(separate)
+    new = view_time(together)
+    print("view change with %d locked 3D patterns" % patterns)
+    print("  100 Line3D per pattern        project in draw, draw %6.1f ms" % (1000 * lines[1]))
+    print("  Line3DCollection per pattern  project %6.1f ms, draw %6.1f ms" % (1000 * old[0], 1000 * old[1]))
+    print("  one ProjectedCollection       project %6.1f ms, draw %6.1f ms (%.1fx projection)" % (
+        1000 * new[0], 1000 * new[1], old[0] / new[0]))
+    assert all(np.allclose(a, b) for a, b in zip(old[2], new[2]))
+
+
+def bench_rotate_proxy(patterns=24, moves=5):
+    # One mouse move of a rotate drag with patterns locked on the axes the
+    # way the 3D scripts draw them (100 Line3D artists each): every vertex
+    # re-projected versus the RotateProxy stand-in
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from matplotlib.backend_bases import MouseEvent
+    from spiral_render import PROXY_POINTS, RotateProxy
+
+    fig = plt.figure(figsize=(10, 7))
+    ax = fig.add_subplot(projection='3d')
+    ax.axis('off')
+    colors = ['tab:red', 'tab:green', 'tab:blue']
+    for _ in range(patterns):
+        x, y, z = spiral_engine.generate_spiral(random.randint(1, 100), is_3d=True)
+        for i in range(0, len(x), len(x) // 100):
+            ax.plot(x[i:i + 200], y[i:i + 200], z[i:i + 200], color=colors[int(3 * i / len(x))])
+    proxy = RotateProxy(fig)
+    fig.canvas.draw()
+
+    def drag():
+        for move in range(moves):
+            ax.view_init(elev=30, azim=-60 + 5 * move)
+            fig.canvas.draw()
+
+    full = timed(drag, 1) / moves
+    press = MouseEvent('button_press_event', fig.canvas, *ax.transAxes.transform((0.5, 0.5)), button=1)
+    start = time.perf_counter()
+    proxy._press(press)
+    swap = time.perf_counter() - start
+    fast = timed(drag, 1) / moves
+    proxy._release(press)
+    shown = sum(artist.get_visible() and not artist.get_animated() for artist in ax.lines)
+    plt.close(fig)
+    print("rotate drag with %d locked 3D patterns (%d Line3D artists)" % (patterns, len(ax.lines)))
+    print("  full detail   %7.1f ms per mouse move" % (1000 * full))
+    print("  proxy         %7.1f ms per mouse move (%.1fx, %d vertices), %.1f ms to swap in" % (
+        1000 * fast, full / fast, PROXY_POINTS, 1000 * swap))
+    assert shown == len(ax.lines)
+
+
+def bench_animation(is_3d=True, buttons=12):
+    # One pattern revealed in 100 frames under a row of buttons: a full
+    # redraw per frame (what plt.pause did) versus BlitAnimator
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from matplotlib.widgets import Button
+    from spiral_render import BlitAnimator, PatternCollection
+
+    data = spiral_engine.generate_spiral(random.randint(1, 100), is_3d=is_3d)
+    fig = plt.figure(figsize=(10, 7))
+    ax = fig.add_subplot(projection='3d' if is_3d else None)
+    widgets = [Button(fig.add_axes([0.02 + i * 0.08, 0.02, 0.07, 0.07]), 'B%d' % i) for i in range(buttons)]
+
+    pattern = PatternCollection(ax, data, ['tab:red', 'tab:green', 'tab:blue'])
+    start = time.perf_counter()
+    for count in range(0, len(pattern), len(pattern) // 100):
+        pattern.reveal(count + len(pattern) // 100)
+        fig.canvas.draw()
+    full = 100 / (time.perf_counter() - start)
+    pattern.remove()
+
+    animation = BlitAnimator(PatternCollection(ax, data, ['tab:red', 'tab:green', 'tab:blue']), len(data[0]) // 100)
+    animation.start()
+    while animation.running:
+        animation.frame()
+    plt.close(fig)
+    print("animation, %d frames of a %s pattern with %d buttons" % (animation.frames, '3D' if is_3d else '2D',
+                                                                    len(widgets)))
+    print("  full redraw per frame %7.1f fps" % full)
+    print("  BlitAnimator          %7.1f fps  (%.1f ms per frame)" % (animation.fps, 1000 * animation.frame_time))
+
+
+def check_scheduler(duration=1.0, target_fps=30):
+    # A heavy pattern must still finish on time, dropping frames to do it
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from spiral_render import BlitAnimator, FrameScheduler, PatternCollection
+
+    print("frame scheduler, %.1f s at %d fps" % (duration, target_fps))
+    for points, dotted in ((20000, False), (200000, True)):
+        fig = plt.figure(figsize=(10, 7))
+        ax = fig.add_subplot(projection='3d')
+        data = spiral_engine.generate_spiral(random.randint(1, 100), points=points, is_3d=True)
+        scheduler = FrameScheduler(target_fps, duration)
+        animation = BlitAnimator(PatternCollection(ax, data, ['r', 'g', 'b'], dotted=dotted), scheduler=scheduler)
+        animation.start()
+        start = time.perf_counter()
+        while animation.running:
+            # Stand-in for the GUI timer: wait out the rest of the period
+            time.sleep(max(0.0, animation.timer.interval / 1000 - scheduler.draw_time))
+            animation.frame()
+        elapsed = time.perf_counter() - start
+        plt.close(fig)
+        print("  %6d %-5s %5.2f s, %3d frames (%d dropped), %5.1f ms per frame; 100 fixed steps: ~%.1f s" % (
+            points, 'dots' if dotted else 'line', elapsed, animation.frames, scheduler.dropped,
+            1000 * animation.frame_time, 100 * (0.02 + animation.frame_time)))
+        assert elapsed < 1.25 * duration + scheduler.draw_time
+
+
+def check_session(requests=50):
+    # Rapid NEXT PATTERN clicks: each draw cancels the last, nothing nests
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from spiral_session import SpiralSession
+
+    fig = plt.figure(figsize=(10, 7))
+    ax = fig.add_subplot(projection='3d')
+    session = SpiralSession()
+    tasks = []
+    cancel_times = []
+    for _ in range(requests):
+        data = spiral_engine.generate_spiral(random.randint(1, 100), is_3d=True)
+        if session.task is not None:
+            session.task.animator.frame()
+            start = time.perf_counter()
+            session.cancel()
+            cancel_times.append(time.perf_counter() - start)
+        tasks.append(session.draw(ax, data, ['r', 'g', 'b']))
+    running = sum(task.running for task in tasks)
+    print("session, %d overlapping draw requests" % requests)
+    print("  still running %d, slowest cancel %.3f ms" % (running, 1000 * max(cancel_times)))
+    assert running == 1 and all(task.cancelled.is_set() for task in tasks[:-1])
+
+    # STOP then RESUME continues the same arrays from the same vertex
+    task = session.task
+    for _ in range(5):
+        time.sleep(0.05)
+        task.animator.frame()
+    session.pause()
+    paused_at, points = task.pattern.count, task.pattern.points
+    start = time.perf_counter()
+    resumed = session.resume()
+    elapsed = time.perf_counter() - start
+    task.animator.frame()
+    plt.close(fig)
+    print("  resumed at vertex %d of %d in %.1f ms" % (paused_at, len(task.pattern), 1000 * elapsed))
+    assert resumed and task.pattern.points is points and task.pattern.count >= paused_at > 0
+
+
+def bench_influence(changes=20):
+    # Shape change on a finished 3D pattern sampled on an adaptive grid (the
+    # scripts' default): a new pattern drawn from scratch, the pattern
+    # regenerated under the new shape (a new adaptive grid and cos/sin) and
+    # replaced, and only its radius recomputed on the grid it already has
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from spiral_render import DRAW_DURATION, PatternCollection
+
+    fig = plt.figure(figsize=(10, 7))
+    ax = fig.add_subplot(projection='3d')
+    colors = ['tab:red', 'tab:green', 'tab:blue']
+    shapes = [spiral_engine.SHAPE_INFLUENCES[i % len(spiral_engine.SHAPE_INFLUENCES)] for i in range(changes)]
+    multiplier = random.randint(1, 100)
+    basis = spiral_engine.pattern_basis(spiral_engine.adaptive_theta(multiplier), dtype=np.float64)
+
+    def rebuild():
+        for shape in shapes:
+            ax.clear()
+            data = spiral_engine.generate_adaptive(random.randint(1, 100), shape, is_3d=True)
+            PatternCollection(ax, data, colors).reveal(len(data[0]))
+            fig.canvas.draw()
+
+    def reshape(generate):
+        pattern = PatternCollection(ax, spiral_engine.generate_on_basis(basis, multiplier, is_3d=True), colors)
+        pattern.reveal(len(pattern))
+
+        def run():
+            for shape in shapes:
+                pattern.replace(generate(shape))
+                fig.canvas.draw()
+        elapsed = timed(run, 1) / changes
+        pattern.remove()
+        return elapsed, pattern
+
+    def regenerate(shape):
+        return spiral_engine.generate_adaptive(multiplier, shape, is_3d=True)
+
+    def radius_only(shape):
+        return spiral_engine.generate_on_basis(basis, multiplier, shape, is_3d=True)
+
+    old = timed(rebuild, 1) / changes
+    regenerated, _ = reshape(regenerate)
+    kept, pattern = reshape(radius_only)
+    plt.close(fig)
+    print("shape change on a finished adaptive 3D pattern (%d vertices), %d changes" % (len(basis.theta), changes))
+    print("  new pattern, rebuilt     %8.2f ms per change, then %.0f s to animate" % (1000 * old, DRAW_DURATION))
+    print("  regenerated, replaced    %8.2f ms per change (generation %6.2f ms)" % (
+        1000 * regenerated, 1000 * timed(lambda: [regenerate(shape) for shape in shapes]) / changes))
+    print("  radius on the same grid  %8.2f ms per change (generation %6.2f ms)" % (
+        1000 * kept, 1000 * timed(lambda: [radius_only(shape) for shape in shapes]) / changes))
+    expected = np.column_stack(radius_only(shapes[-1]))
+    assert np.array_equal(pattern.points, expected) and pattern.count == len(pattern)
+    # On its own grid the radius-only path is exactly the adaptive pattern
+    assert all(np.array_equal(a, b) for a, b in zip(radius_only(None), regenerate(None)))
+
+
+def bench_zoom(ticks=200, locked=10):
+    # One zoom slider tick: builtin min()/max() over the arrays (what
+    # on_slider_val_change did) versus bounds cached per pattern
+    from spiral_render import union_bounds
+
+    patterns = [spiral_engine.generate_spiral(random.randint(1, 100), is_3d=True) for _ in range(locked)]
+    x, y, z = patterns[-1]
+    cached = [np.column_stack([(array.min(), array.max()) for array in pattern]).T for pattern in patterns]
+
+    def scan():
+        for _ in range(ticks):
+            [(min(array), max(array)) for array in (x, y, z)]
+
+    def lookup():
+        for _ in range(ticks):
+            union_bounds(*cached)
+
+    old = timed(scan, 1) / ticks
+    new = timed(lookup) / ticks
+    print("zoom slider tick, 3D, %d locked patterns" % locked)
+    print("  builtin min/max, last pattern only  %8.3f ms" % (1000 * old))
+    print("  cached bounds, all patterns         %8.3f ms (%.0fx)" % (1000 * new, old / new))
+    expected = [(min(array.min() for array in arrays), max(array.max() for array in arrays))
+                for arrays in zip(*patterns)]
+    assert np.allclose(union_bounds(*cached), expected)
+
+
+def bench_prefetch(clicks=20, animation_seconds=0.1):
+    # NEXT PATTERN latency: generating on click versus taking a prefetched pattern
+    from spiral_session import PatternPrefetcher
+
+    def make_pattern(settings):
+        shape, is_3d = settings
+        return spiral_engine.generate_adaptive(random.randint(1, 100), shape, is_3d=is_3d), None
+
+    print("prefetch, %d clicks %.1f s apart" % (clicks, animation_seconds))
+    for depth in (0, 1, 2):
+        prefetcher = PatternPrefetcher(make_pattern, depth)
+        prefetcher.prefetch(('circle', True))
+        latency = []
+        for _ in range(clicks):
+            time.sleep(animation_seconds)
+            start = time.perf_counter()
+            prefetcher.take(('circle', True))
+            latency.append(time.perf_counter() - start)
+        prefetcher.shutdown()
+        print("  depth %d  mean %6.2f ms, worst %6.2f ms  (%d hits, %d misses)" % (
+            depth, 1000 * np.mean(latency), 1000 * max(latency), prefetcher.hits, prefetcher.misses))
+
+
+def bench_producer(points=2000000, queue_size=8):
+    # UI-thread time spent producing a large pattern's vertices: generating
+    # it on the event thread versus draining a worker thread's bounded queue
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from spiral_session import SpiralSession
+
+    multiplier = random.randint(1, 100)
+    theta_stop = (points - 1) * spiral_engine.THETA_STEP
+    start = time.perf_counter()
+    np.column_stack(spiral_engine.generate_spiral(multiplier, theta_stop=theta_stop, points=points))
+    blocking = time.perf_counter() - start
+
+    fig = plt.figure(figsize=(10, 7))
+    ax = fig.add_subplot()
+    chunks = spiral_engine.iter_spiral(multiplier, theta_stop=theta_stop, chunk=16384)
+    task = SpiralSession().stream(ax, chunks, spiral_engine.stream_points(0, theta_stop), [(-1, 1), (-1, 1)],
+                                  ['r', 'g', 'b'], queue_size=queue_size)
+    feed = task.animator.feed
+    drains = []
+
+    def timed_feed():
+        begin = time.perf_counter()
+        feed()
+        drains.append(time.perf_counter() - begin)
+
+    task.animator.feed = timed_feed
+    largest_queue = 0
+    while task.running:
+        time.sleep(0.02)
+        largest_queue = max(largest_queue, task.producer.queue.qsize())
+        task.animator.frame()
+    plt.close(fig)
+    print("producer/consumer, %d-point pattern" % points)
+    print("  generated on the UI thread: %7.1f ms in one block" % (1000 * blocking))
+    print("  streamed: longest drain %7.1f ms, %7.1f ms total over %d frames; queue peaked at %d of %d" % (
+        1000 * max(drains), 1000 * sum(drains), len(drains), largest_queue, queue_size))
+    assert largest_queue <= queue_size
+
+
+def check_precision(count=20, tolerance=0.5):
+    # float32 curves must land within tolerance pixels of the float64 ones
+    worst = 0.0
+    changed = 0.0
+    for _ in range(count):
+        args = (random.randint(1, 100), random.choice(spiral_engine.SHAPE_INFLUENCES))
+        pixels64, image64 = render_pattern(*spiral_engine.generate_spiral(*args, dtype=np.float64))
+        pixels32, image32 = render_pattern(*spiral_engine.generate_spiral(*args, dtype=np.float32))
+        worst = max(worst, np.abs(pixels64 - pixels32).max())
+        changed = max(changed, np.any(image64 != image32, axis=-1).mean())
+    x, y = spiral_engine.generate_batch(range(1, 101), dtype=np.float32)
+    print("float32 vs float64, %d rendered patterns" % count)
+    print("  max vertex offset %.2e px (tolerance %.2f px)" % (worst, tolerance))
+    print("  max changed pixels %.4f%%" % (100 * changed))
+    print("  100-pattern batch %.1f MB instead of %.1f MB" % ((x.nbytes + y.nbytes) / 1e6,
+                                                           2 * (x.nbytes + y.nbytes) / 1e6))
+    assert worst <= tolerance
+
+
+def check_allocations(count=500):
+    # Steady-state generation into a SpiralWorkspace must not allocate
+    # arrays, on the uniform grid and on a kept adaptive grid (what
+    # SpiralSession.reshape() generates on), nor may the reshape itself
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from spiral_session import SpiralSession
+
+    workspace = spiral_engine.SpiralWorkspace()
+    patterns = [(random.randint(1, 100), random.choice(spiral_engine.SHAPE_INFLUENCES),
+                 random.choice(spiral_engine.AXIS_INFLUENCES), random.randint(1, 100))
+                for _ in range(count)]
+    basis = spiral_engine.pattern_basis(spiral_engine.adaptive_theta(100), dtype=np.float64)
+
+    def on_basis(*pattern, is_3d):
+        return spiral_engine.generate_on_basis(basis, *pattern, is_3d=is_3d)
+
+    def in_workspace(*pattern, is_3d):
+        return workspace.generate_on(basis, *pattern, is_3d=is_3d)
+
+    for pattern in patterns[:10]:
+        workspace.generate(*pattern, is_3d=True)
+        spiral_engine.generate_spiral(*pattern, is_3d=True)
+        in_workspace(*pattern, is_3d=True)
+
+    def traced_peak(generate):
+        tracemalloc.start()
+        for pattern in patterns:
+            generate(*pattern, is_3d=True)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+
+    allocating = traced_peak(spiral_engine.generate_spiral)
+    in_place = traced_peak(workspace.generate)
+    adaptive = traced_peak(on_basis)
+    adaptive_in_place = traced_peak(in_workspace)
+    array_bytes = workspace.grid['points'] * workspace.x.itemsize
+    print("allocations over %d patterns" % count)
+    print("  generate_spiral              peak %9d bytes" % allocating)
+    print("  SpiralWorkspace.generate     peak %9d bytes (one curve array is %d bytes)" % (in_place, array_bytes))
+    print("  generate_on_basis, adaptive  peak %9d bytes" % adaptive)
+    print("  SpiralWorkspace.generate_on  peak %9d bytes (one curve array is %d bytes)" % (
+        adaptive_in_place, basis.theta.nbytes))
+    print("  speed %.3f s vs %.3f s" % (timed(lambda: [spiral_engine.generate_spiral(*p) for p in patterns]),
+                                        timed(lambda: [workspace.generate(*p) for p in patterns])))
+    assert in_place < array_bytes // 4 and adaptive_in_place < basis.theta.nbytes // 4
+
+    # Shape changes through a session: vertices go workspace -> pattern array
+    fig = plt.figure(figsize=(10, 7))
+    ax = fig.add_subplot(projection='3d')
+    session = SpiralSession()
+    session.draw(ax, spiral_engine.generate_on_basis(basis, 100, is_3d=True), ['r', 'g', 'b'], play=False)
+    session.reshape(basis, 100, 'square')
+    points = session.pattern.points
+    tracemalloc.start()
+    for shape in spiral_engine.SHAPE_INFLUENCES * 5:
+        session.reshape(basis, 100, shape)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    plt.close(fig)
+    print("  SpiralSession.reshape        peak %9d bytes (pattern vertices are %d bytes)" % (peak, points.nbytes))
+    assert session.pattern.points is points and peak < points.nbytes // 4
+
+
+def chord_error(theta, multiplier, shape_influence=None, dense_points=1000001):
+    # Largest distance, in pixels, between the curve and its polyline through theta
+    dense = np.linspace(theta[0], theta[-1], dense_points)
+    r = spiral_engine.spiral_radius(theta, multiplier, shape_influence)
+    exact = spiral_engine.spiral_radius(dense, multiplier, shape_influence)
+    dx = exact * np.cos(dense) - np.interp(dense, theta, r * np.cos(theta))
+    dy = exact * np.sin(dense) - np.interp(dense, theta, r * np.sin(theta))
+    return spiral_engine.ADAPTIVE_SCALE * np.hypot(dx, dy).max()
+
+
+def check_adaptive(tolerance=spiral_engine.ADAPTIVE_TOLERANCE):
+    # Square is left out: its jumps through the origin are not a smooth curve
+    uniform = spiral_engine.theta_grid(dtype=np.float64)
+    print("adaptive sampling, tolerance %.2f px at %d px per unit" % (tolerance, spiral_engine.ADAPTIVE_SCALE))
+    print("  multiplier shape      points  error px   uniform %d error px" % len(uniform))
+    for multiplier in (1, 10, 50, 100):
+        for shape in (None, 'circle', 'triangle'):
+            theta = spiral_engine.adaptive_theta(multiplier, shape, tolerance=tolerance)
+            error = chord_error(theta, multiplier, shape)
+            print("  %10d %-9s %8d %9.3f %9.3f" % (multiplier, shape, len(theta), error,
+                                                  chord_error(uniform, multiplier, shape)))
+            assert error <= tolerance * 1.01
+    patterns = [random.randint(1, 100) for _ in range(50)]
+    print("  50 patterns: %.3f s adaptive vs %.3f s uniform" % (
+        timed(lambda: [spiral_engine.generate_adaptive(m) for m in patterns]),
+        timed(lambda: [plot_spiral_math(m) for m in patterns])))
+
+
+def check_stream(points=20000000):
+    # A long spiral streamed chunk by chunk must not grow memory with its length
+    def consume(count):
+        low, high = np.inf, -np.inf
+        stream = spiral_engine.iter_spiral(random.randint(1, 100), random.choice(spiral_engine.SHAPE_INFLUENCES),
+                                           theta_stop=(count - 1) * spiral_engine.THETA_STEP, is_3d=True)
+        for x, y, z in stream:
+            low, high = min(low, x.min(), y.min()), max(high, x.max(), y.max())
+        return low, high
+
+    peaks = []
+    for count in (points // 100, points):
+        tracemalloc.start()
+        elapsed = timed(lambda: consume(count), repeat=1)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        print("streamed %11d points in %7.3f s, peak %6.1f MB" % (count, elapsed, peaks[-1] / 1e6))
+    assert peaks[1] < 1.5 * peaks[0]
+
+
+def check_density(points=100000000, dots=1000000):
+    # Density mode: a huge stream binned at constant memory into one image,
+    # versus the same pattern drawn as Dot Trail markers (on screen and to PDF)
+    import io
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from spiral_render import DensityImage, PatternCollection
+    from spiral_session import DensityAccumulator
+
+    multiplier, shape = random.randint(1, 100), random.choice(spiral_engine.SHAPE_INFLUENCES)
+    bounds = [(-1, 1), (-1, 1)]
+    colors = ['tab:red', 'tab:green', 'tab:blue']
+
+    def stream(count):
+        return spiral_engine.iter_spiral(multiplier, shape, theta_stop=spiral_engine.THETA_STOP,
+                                         step=spiral_engine.THETA_STOP / (count - 1), chunk=2 ** 18)
+
+    x, y = spiral_engine.generate_spiral(multiplier, shape, points=dots)
+    accumulator = DensityAccumulator(stream(dots), bounds)
+    accumulator.start()
+    accumulator.join()
+    expected = np.histogram2d(y, x, bins=spiral_engine.DENSITY_SHAPE, range=bounds[::-1])[0]
+    assert accumulator.done.is_set() and np.abs(accumulator.counts - expected).sum() <= 1e-4 * dots
+
+    peaks = []
+    print("density mode, multiplier %d, shape %s" % (multiplier, shape))
+    for count in (points // 100, points):
+        accumulator = DensityAccumulator(stream(count), bounds)
+        tracemalloc.start()
+        accumulator.start()
+        accumulator.join()
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        print("  binned %11d points in %6.2f s (%5.1f M points/s), peak %5.1f MB" % (
+            accumulator.points, accumulator.elapsed, accumulator.points / accumulator.elapsed / 1e6, peaks[-1] / 1e6))
+    assert peaks[1] < 1.5 * peaks[0] and accumulator.counts.sum() > 0.99 * points
+
+    def show(add):
+        fig = plt.figure(figsize=(10, 7))
+        ax = fig.add_subplot()
+        ax.axis('off')
+        add(ax)
+        draw = timed(fig.canvas.draw, 1)
+        pdf = io.BytesIO()
+        start = time.perf_counter()
+        fig.savefig(pdf, format='pdf')
+        saved = time.perf_counter() - start
+        plt.close(fig)
+        return draw, saved, len(pdf.getvalue())
+
+    def dotted(ax):
+        pattern = PatternCollection(ax, (x, y), colors, dotted=True)
+        pattern.reveal(len(pattern))
+
+    old = show(dotted)
+    new = show(lambda ax: DensityImage(ax, accumulator.counts, bounds, colors))
+    print("  Dot Trail, %11d points  draw %7.1f ms, PDF %7.1f ms, %8.1f kB" % (
+        dots, 1000 * old[0], 1000 * old[1], old[2] / 1e3))
+    print("  density,   %11d points  draw %7.1f ms, PDF %7.1f ms, %8.1f kB" % (
+        accumulator.points, 1000 * new[0], 1000 * new[1], new[2] / 1e3))
+
+
+BENCHMARKS = {
+    'adaptive': check_adaptive,
+    'allocations': check_allocations,
+    'animation': bench_animation,
+    'batch': bench_batch,
+    'deep_zoom': bench_deep_zoom,
+    'density': check_density,
+    'harmonics': bench_harmonics,
+    'influence': bench_influence,
+    'kernels': bench_kernels,
+    'lod': bench_lod,
+    'precision': check_precision,
+    'producer': bench_producer,
+    'prefetch': bench_prefetch,
+    'projection': bench_projection,
+    'render': bench_render,
+    'rotate_proxy': bench_rotate_proxy,
+    'scheduler': check_scheduler,
+    'session': check_session,
+    'stream': check_stream,
+    'theta_basis': bench_theta_basis,
+    'zoom': bench_zoom,
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks and checks for spiral_engine")
+    parser.add_argument('names', nargs='*', metavar='name',
+                        help="benchmarks to run (default: all of %s)" % ', '.join(sorted(BENCHMARKS)))
+    args = parser.parse_args()
+    for name in args.names or sorted(BENCHMARKS):
+        if name not in BENCHMARKS:
+            parser.error("unknown benchmark: %s" % name)
+        BENCHMARKS[name]()
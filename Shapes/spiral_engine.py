@@ -0,0 +1,686 @@
+import functools
+import os
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+
+# Spiral parameters shared by every Shapes script
+THETA_START = 0
+THETA_STOP = 8 * np.pi
+POINTS = 20000
+Z_STOP = 10
+MULTIPLIER_RANGE = (1, 100)
+SHAPE_INFLUENCES = (None, 'circle', 'square', 'triangle')
+AXIS_INFLUENCES = ('spiral', 'random')
+THETA_CACHE_SIZE = 8
+HARMONIC_MAX = MULTIPLIER_RANGE[1]
+HARMONIC_CACHE_SIZE = 2
+# Larger grids (e.g. density mode) skip the table and use np.sin directly
+HARMONIC_MAX_BYTES = 64 * 2**20
+# float64 by default; SHAPES_PRECISION=float32 halves memory and bandwidth
+PRECISION = np.dtype(os.environ.get('SHAPES_PRECISION', 'float64'))
+# Harmonic tables are persisted here; set to None to keep them in memory only
+CACHE_DIR = os.environ.get('SHAPES_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'shapes'))
+
+ThetaBasis = namedtuple('ThetaBasis', 'theta cos sin z decay')
+HarmonicTable = namedtuple('HarmonicTable', 'sin cos')
+
+
+@functools.lru_cache(maxsize=THETA_CACHE_SIZE)
+def _cached_theta_basis(start, stop, points, dtype):
+    theta = np.linspace(start, stop, points).astype(dtype, copy=False)
+    basis = ThetaBasis(theta, np.cos(theta), np.sin(theta),
+                       np.linspace(0, Z_STOP, points).astype(dtype, copy=False), np.exp(-theta / 10))
+    for array in basis:
+        array.flags.writeable = False
+    return basis
+
+
+def theta_basis(start=THETA_START, stop=THETA_STOP, points=POINTS, dtype=None):
+    """Return the shared, read-only theta grid with its cos/sin/z/decay bases.
+
+    Grids are kept in a small LRU cache keyed on (start, stop, points, dtype);
+    theta_basis_info() reports its hits and misses.
+    """
+    return _cached_theta_basis(float(start), float(stop), int(points), np.dtype(dtype or PRECISION).str)
+
+
+def pattern_basis(theta, theta_start=THETA_START, theta_stop=THETA_STOP, dtype=None):
+    """Return a read-only ThetaBasis for any theta grid (e.g. an adaptive_theta() one).
+
+    Not cached, unlike theta_basis(): a drawn pattern keeps the basis it
+    was sampled on, so generate_on_basis() can redo it under another
+    influence without touching cos/sin. z rises from 0 to Z_STOP across
+    [theta_start, theta_stop].
+    """
+    theta = np.asarray(theta, dtype=dtype or PRECISION)
+    z = (theta - theta_start) * (Z_STOP / (theta_stop - theta_start))
+    basis = ThetaBasis(theta, np.cos(theta), np.sin(theta), z, np.exp(-theta / 10))
+    for array in basis:
+        array.flags.writeable = False
+    return basis
+
+
+def theta_basis_info():
+    return _cached_theta_basis.cache_info()
+
+
+def clear_theta_basis():
+    _cached_theta_basis.cache_clear()
+
+
+def _build_harmonics(basis, max_k):
+    # Angle addition: sin((k+1)t) = sin(kt)cos(t) + cos(kt)sin(t), and the
+    # matching cos identity, gives every harmonic from the cos/sin basis.
+    table = np.empty((2, max_k + 1, len(basis.theta)))
+    sin_k, cos_k = table
+    sin_k[0] = 0
+    cos_k[0] = 1
+    for k in range(max_k):
+        np.multiply(sin_k[k], basis.cos, out=sin_k[k + 1])
+        sin_k[k + 1] += cos_k[k] * basis.sin
+        np.multiply(cos_k[k], basis.cos, out=cos_k[k + 1])
+        cos_k[k + 1] -= sin_k[k] * basis.sin
+    # Near the zeros the recurrence error could flip np.sign (square shape),
+    # so those few entries are evaluated directly.
+    rows, columns = np.nonzero(np.abs(sin_k) < 1e-9)
+    sin_k[rows, columns] = np.sin(rows * basis.theta[columns])
+    rows, columns = np.nonzero(np.abs(cos_k) < 1e-9)
+    cos_k[rows, columns] = np.cos(rows * basis.theta[columns])
+    return table
+
+
+def _harmonic_path(start, stop, points, max_k, dtype):
+    name = 'harmonics_%r_%r_%d_%d_%s.npy' % (start, stop, points, max_k, np.dtype(dtype).name)
+    return os.path.join(CACHE_DIR, name)
+
+
+@functools.lru_cache(maxsize=HARMONIC_CACHE_SIZE)
+def _cached_harmonic_table(start, stop, points, max_k, dtype):
+    path = _harmonic_path(start, stop, points, max_k, dtype) if CACHE_DIR else None
+    if path and os.path.exists(path):
+        return HarmonicTable(*np.asarray(np.load(path, mmap_mode='r')))
+    table = _build_harmonics(_cached_theta_basis(start, stop, points, np.dtype(float).str), max_k)
+    table = table.astype(dtype, copy=False)
+    if path:
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            handle, temp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.npy')
+            with os.fdopen(handle, 'wb') as f:
+                np.save(f, table)
+            os.replace(temp_path, path)
+            return HarmonicTable(*np.asarray(np.load(path, mmap_mode='r')))
+        except OSError:
+            pass
+    table.flags.writeable = False
+    return HarmonicTable(*table)
+
+
+def harmonic_table(start=THETA_START, stop=THETA_STOP, points=POINTS, max_k=HARMONIC_MAX, dtype=None):
+    """Return read-only (max_k + 1, points) tables of sin(k*theta) and cos(k*theta).
+
+    The table is built with one recurrence pass over the cached theta basis
+    and memory-mapped from CACHE_DIR, so later startups only map the file.
+    """
+    return _cached_harmonic_table(float(start), float(stop), int(points), int(max_k),
+                                  np.dtype(dtype or PRECISION).str)
+
+
+def _harmonic_grid(start, points, dtype):
+    # Only grids starting at THETA_START whose table fits HARMONIC_MAX_BYTES
+    table_bytes = 2 * (HARMONIC_MAX + 1) * int(points) * np.dtype(dtype or PRECISION).itemsize
+    return start == THETA_START and table_bytes <= HARMONIC_MAX_BYTES
+
+
+def _harmonic_row(multiplier, start, stop, points, dtype):
+    # Whole multipliers on table-sized grids are a table row
+    if (_harmonic_grid(start, points, dtype) and float(multiplier).is_integer()
+            and 0 <= multiplier <= HARMONIC_MAX):
+        return harmonic_table(start, stop, points, dtype=dtype).sin[int(multiplier)]
+    return None
+
+
+def harmonic_sin(multiplier, start=THETA_START, stop=THETA_STOP, points=POINTS, dtype=None):
+    """Return sin(multiplier * theta), one row per multiplier if given an array.
+
+    Whole multipliers on grids starting at THETA_START are a row lookup in
+    the harmonic table; anything else (e.g. a resumed theta range, or a
+    grid whose table would exceed HARMONIC_MAX_BYTES) is evaluated directly.
+    """
+    if np.ndim(multiplier) == 0:
+        row = _harmonic_row(multiplier, start, stop, points, dtype)
+        if row is not None:
+            return row
+        return np.sin(multiplier * theta_basis(start, stop, points, dtype).theta)
+    multiplier = np.asarray(multiplier, dtype=float)
+    if (_harmonic_grid(start, points, dtype) and np.all(multiplier == np.round(multiplier))
+            and np.all((multiplier >= 0) & (multiplier <= HARMONIC_MAX))):
+        return harmonic_table(start, stop, points, dtype=dtype).sin[multiplier.astype(int)]
+    theta = theta_basis(start, stop, points, dtype).theta
+    return np.sin(multiplier[:, None].astype(theta.dtype) * theta)
+
+
+def theta_grid(start=THETA_START, stop=THETA_STOP, points=POINTS, dtype=None):
+    return theta_basis(start, stop, points, dtype).theta
+
+
+def z_grid(points=POINTS, dtype=None):
+    return theta_basis(points=points, dtype=dtype).z
+
+
+def as_precision(data, dtype=None):
+    # Cast a LAST_DATA-style tuple of arrays (or None) to the working precision
+    if data is None:
+        return None
+    return tuple(np.asarray(array, dtype=dtype or PRECISION) for array in data)
+
+
+# Influence kernels. An axis kernel writes the sine wave of a pattern into
+# out, or returns a read-only harmonic table row when harmonic(k) has one;
+# a shape kernel turns that wave into the radius, writing into out (which
+# may be the wave itself). decay is exp(-theta / 10) when already known.
+AXIS_KERNELS = {}
+SHAPE_KERNELS = {}
+
+
+def axis_kernel(name):
+    def register(kernel):
+        AXIS_KERNELS[name] = kernel
+        return kernel
+    return register
+
+
+def shape_kernel(name):
+    def register(kernel):
+        SHAPE_KERNELS[name] = kernel
+        return kernel
+    return register
+
+
+def _no_harmonic(k):
+    return None
+
+
+@axis_kernel('spiral')
+def _spiral_axis(out, theta, multiplier, axis_multiplier=None, harmonic=_no_harmonic):
+    wave = harmonic(multiplier)
+    if wave is None:
+        wave = np.sin(np.multiply(theta, multiplier, out=out), out=out)
+    return wave
+
+
+@axis_kernel('random')
+def _random_axis(out, theta, multiplier, axis_multiplier=None, harmonic=_no_harmonic):
+    # Bends the spiral axis with a second sine wave (Shapes_v6_3D.py)
+    if axis_multiplier is None:
+        raise ValueError("axis_multiplier is required for the 'random' axis influence")
+    axis = harmonic(axis_multiplier)
+    if axis is None:
+        axis = np.sin(np.multiply(theta, axis_multiplier, out=out), out=out)
+    return np.sin(np.multiply(axis, multiplier, out=out), out=out)
+
+
+@shape_kernel(None)
+def _damped_shape(wave, theta, out, decay=None):
+    if decay is None:
+        return np.multiply(wave, np.exp(-theta / 10), out=out)
+    return np.multiply(wave, decay, out=out)
+
+
+@shape_kernel('circle')
+def _circle_shape(wave, theta, out, decay=None):
+    if wave is not out:
+        np.copyto(out, wave)
+    return out
+
+
+@shape_kernel('square')
+def _square_shape(wave, theta, out, decay=None):
+    return np.sign(wave, out=out)
+
+
+@shape_kernel('triangle')
+def _triangle_shape(wave, theta, out, decay=None):
+    return np.abs(wave, out=out)
+
+
+def _kernel(kernels, name, kind):
+    if kind == 'axis' and name is None:
+        name = 'spiral'
+    try:
+        return kernels[name]
+    except KeyError:
+        raise ValueError("unknown %s influence: %r" % (kind, name)) from None
+
+
+def compose(shape_influence=None, axis_influence='spiral'):
+    """Return radius(out, theta, multiplier, axis_multiplier=None, decay=None, harmonic=None).
+
+    The composed kernel runs the axis kernel then the shape kernel in one
+    pass over out, so e.g. compose('triangle', 'random') needs no
+    temporaries beyond the caller's buffer.
+    """
+    axis = _kernel(AXIS_KERNELS, axis_influence, 'axis')
+    shape = _kernel(SHAPE_KERNELS, shape_influence, 'shape')
+
+    def radius(out, theta, multiplier, axis_multiplier=None, decay=None, harmonic=None):
+        wave = axis(out, theta, multiplier, axis_multiplier, harmonic or _no_harmonic)
+        return shape(wave, theta, out, decay)
+    return radius
+
+
+def _as_theta(theta):
+    theta = np.asarray(theta)
+    return theta.astype(np.result_type(theta, np.float32), copy=False)
+
+
+def sine_wave(theta, multiplier, axis_influence='spiral', axis_multiplier=None):
+    theta = _as_theta(theta)
+    return _kernel(AXIS_KERNELS, axis_influence, 'axis')(np.empty_like(theta), theta, multiplier, axis_multiplier,
+                                                          _no_harmonic)
+
+
+def shape_radius(wave, theta, shape_influence=None):
+    wave = np.asarray(wave)
+    return _kernel(SHAPE_KERNELS, shape_influence, 'shape')(wave, theta, np.empty_like(wave))
+
+
+def spiral_radius(theta, multiplier, shape_influence=None, axis_influence='spiral', axis_multiplier=None):
+    theta = _as_theta(theta)
+    return compose(shape_influence, axis_influence)(np.empty_like(theta), theta, multiplier, axis_multiplier)
+
+
+def _spiral_kernel(x, y, basis, grid, multiplier, shape_influence, axis_influence, axis_multiplier):
+    # Writes the pattern into x and y using only those two buffers: x takes
+    # the wave then the radius in place.
+    compose(shape_influence, axis_influence)(x, basis.theta, multiplier, axis_multiplier, basis.decay,
+                                             lambda k: _harmonic_row(k, *grid))
+    np.multiply(x, basis.sin, out=y)
+    np.multiply(x, basis.cos, out=x)
+
+
+def generate_spiral(multiplier, shape_influence=None, axis_influence='spiral', axis_multiplier=None,
+                    theta_start=THETA_START, theta_stop=THETA_STOP, points=POINTS, is_3d=False, atlas=None,
+                    dtype=None, out=None):
+    """Return the (x, y) or (x, y, z) arrays of one spiral pattern.
+
+    Pure NumPy: no pyplot, no globals, no randomness. Callers draw the
+    multipliers themselves (e.g. random.randint(*MULTIPLIER_RANGE)).
+    Patterns found in atlas (see spiral_atlas.py) are served read-only
+    from it instead of being computed. Arrays are dtype (default PRECISION),
+    or written into the caller's out=(x, y) buffers without allocating.
+    """
+    basis = theta_basis(theta_start, theta_stop, points, dtype)
+    dtype = basis.theta.dtype
+    pattern = None
+    if atlas is not None:
+        pattern = atlas.lookup(multiplier, shape_influence, axis_influence, axis_multiplier,
+                               theta_start, theta_stop, points)
+    if out is not None:
+        x, y = out
+        if pattern is not None:
+            np.copyto(x, pattern[0])
+            np.copyto(y, pattern[1])
+    elif pattern is not None:
+        x, y = (array.astype(dtype, copy=False) for array in pattern)
+    else:
+        x = np.empty(points, dtype)
+        y = np.empty(points, dtype)
+    if pattern is None:
+        _spiral_kernel(x, y, basis, (theta_start, theta_stop, points, dtype),
+                       multiplier, shape_influence, axis_influence, axis_multiplier)
+    if is_3d:
+        return x, y, basis.z
+    return x, y
+
+
+class SpiralWorkspace:
+    """Reusable x/y buffers for generating patterns in a tight loop.
+
+    generate() (on the uniform grid) and generate_on() (on any basis, e.g.
+    an adaptive one) write into the same two arrays every call, growing
+    them only for a longer grid than they have held, so steady-state
+    generation allocates nothing; copy the result if it has to outlive the
+    next call (PatternCollection does).
+    """
+
+    def __init__(self, theta_start=THETA_START, theta_stop=THETA_STOP, points=POINTS, dtype=None):
+        self.grid = dict(theta_start=theta_start, theta_stop=theta_stop, points=points,
+                         dtype=theta_basis(theta_start, theta_stop, points, dtype).theta.dtype)
+        self.x = np.empty(points, self.grid['dtype'])
+        self.y = np.empty(points, self.grid['dtype'])
+
+    def _buffers(self, points):
+        if len(self.x) < points:
+            self.x = np.empty(points, self.x.dtype)
+            self.y = np.empty(points, self.y.dtype)
+        return self.x[:points], self.y[:points]
+
+    def generate(self, multiplier, shape_influence=None, axis_influence='spiral', axis_multiplier=None,
+                 is_3d=False, atlas=None):
+        return generate_spiral(multiplier, shape_influence, axis_influence, axis_multiplier, is_3d=is_3d, atlas=atlas,
+                               out=self._buffers(self.grid['points']), **self.grid)
+
+    def generate_on(self, basis, multiplier, shape_influence=None, axis_influence='spiral', axis_multiplier=None,
+                    is_3d=False):
+        return generate_on_basis(basis, multiplier, shape_influence, axis_influence, axis_multiplier, is_3d,
+                                 out=self._buffers(len(basis.theta)))
+
+
+# Adaptive sampling: maximum chord error in pixels, and pixels per data unit
+# of the scripts' 10x7 inch figure at 100 dpi with the curve spanning +-1
+ADAPTIVE_TOLERANCE = 0.25
+ADAPTIVE_SCALE = 350
+ADAPTIVE_POINTS = (500, 200000)
+
+
+def _curve_bound(theta, multiplier, shape_influence, axis_influence, axis_multiplier):
+    # Upper bound on |d2p/dtheta2| for p = r(theta) * (cos, sin) with
+    # r = A(theta) * sin(phi(theta)): phi = multiplier * theta, or
+    # multiplier * sin(axis_multiplier * theta) for the 'random' axis.
+    if axis_influence == 'random':
+        if axis_multiplier is None:
+            raise ValueError("axis_multiplier is required for the 'random' axis influence")
+        phase = axis_multiplier * theta
+        slope = multiplier * axis_multiplier * np.abs(np.cos(phase))
+        bend = multiplier * axis_multiplier ** 2 * np.abs(np.sin(phase))
+    elif axis_influence in (None, 'spiral'):
+        slope = np.full_like(theta, float(multiplier))
+        bend = 0
+    else:
+        _kernel(AXIS_KERNELS, axis_influence, 'axis')
+        raise ValueError("no curvature bound for the %r axis influence" % (axis_influence,))
+    bound = slope ** 2 + bend + 2.2 * slope + 1.21
+    if shape_influence is None:
+        bound *= np.exp(-theta / 10)
+    else:
+        _kernel(SHAPE_KERNELS, shape_influence, 'shape')
+    return bound
+
+
+def adaptive_theta(multiplier, shape_influence=None, axis_influence='spiral', axis_multiplier=None,
+                   theta_start=THETA_START, theta_stop=THETA_STOP, tolerance=ADAPTIVE_TOLERANCE,
+                   scale=ADAPTIVE_SCALE, min_points=ADAPTIVE_POINTS[0], max_points=ADAPTIVE_POINTS[1]):
+    """Return a non-uniform theta grid whose chords stay within tolerance pixels of the curve.
+
+    A chord over a step h deviates from the curve by at most h**2 * |p''| / 8,
+    so the local density is sqrt(|p''| * scale / (8 * tolerance)) points per
+    radian. Low multipliers get a few hundred points, high ones as many as
+    they need, up to max_points.
+    """
+    span = theta_stop - theta_start
+    axis_cycles = axis_multiplier if axis_influence == 'random' and axis_multiplier else 1
+    pilot = np.linspace(theta_start, theta_stop, int(max(1024, 64 * axis_cycles * span / (2 * np.pi))))
+    bound = _curve_bound(pilot, multiplier, shape_influence, axis_influence, axis_multiplier)
+    density = np.sqrt(bound * scale / (8.0 * tolerance))
+    # Each pilot interval uses the larger density of its two ends
+    counts = np.maximum(density[1:], density[:-1]) * np.diff(pilot)
+    cumulative = np.concatenate(([0.0], np.cumsum(counts)))
+    points = int(np.clip(np.ceil(cumulative[-1]) + 1, min_points, max_points))
+    theta = np.interp(np.linspace(0, cumulative[-1], points), cumulative, pilot)
+    if shape_influence in ('square', 'triangle'):
+        # Their corners sit where the wave crosses zero, so sample those exactly
+        theta = np.unique(np.concatenate((theta, _wave_zeros(theta, multiplier, axis_influence, axis_multiplier))))
+    return theta
+
+
+def _wave_zeros(theta, multiplier, axis_influence, axis_multiplier, iterations=4):
+    # Roots of sin(multiplier * axis) between grid nodes, by regula falsi
+    def wave(t):
+        return sine_wave(t, multiplier, axis_influence, axis_multiplier)
+    values = wave(theta)
+    index = np.flatnonzero(values[:-1] * values[1:] < 0)
+    low, high = theta[index], theta[index + 1]
+    f_low, f_high = values[index], values[index + 1]
+    for _ in range(iterations):
+        root = low - f_low * (high - low) / (f_high - f_low)
+        f_root = wave(root)
+        left = f_low * f_root < 0
+        high, f_high = np.where(left, root, high), np.where(left, f_root, f_high)
+        low, f_low = np.where(left, low, root), np.where(left, f_low, f_root)
+    return low - f_low * (high - low) / (f_high - f_low)
+
+
+def generate_adaptive(multiplier, shape_influence=None, axis_influence='spiral', axis_multiplier=None,
+                      theta_start=THETA_START, theta_stop=THETA_STOP, is_3d=False,
+                      tolerance=ADAPTIVE_TOLERANCE, scale=ADAPTIVE_SCALE, dtype=None):
+    """generate_spiral() on an adaptive_theta() grid instead of POINTS uniform samples.
+
+    z still rises linearly from 0 to Z_STOP across [theta_start, theta_stop],
+    so 3D patterns match the uniform ones.
+    """
+    theta = adaptive_theta(multiplier, shape_influence, axis_influence, axis_multiplier,
+                           theta_start, theta_stop, tolerance, scale)
+    basis = pattern_basis(theta, theta_start, theta_stop, np.float64)
+    return generate_on_basis(basis, multiplier, shape_influence, axis_influence, axis_multiplier, is_3d, dtype)
+
+
+def generate_on_basis(basis, multiplier, shape_influence=None, axis_influence='spiral', axis_multiplier=None,
+                      is_3d=False, dtype=None, out=None):
+    """Return (x, y) or (x, y, z) of a pattern sampled on an existing basis.
+
+    Only the radius is computed; cos, sin, z and the damping come from the
+    basis (theta_basis() or pattern_basis()), so a drawn pattern can take
+    another influence on the grid it already has. Like generate_spiral(),
+    out=(x, y) buffers are written in place without allocating.
+    """
+    if out is None:
+        x = np.empty_like(basis.theta)
+        y = np.empty_like(basis.theta)
+    else:
+        x, y = out
+    wave = _kernel(AXIS_KERNELS, axis_influence, 'axis')(x, basis.theta, multiplier, axis_multiplier, _no_harmonic)
+    if wave is not x:
+        np.copyto(x, wave)
+    # Snap zero crossings on the grid (adaptive_theta() inserts them) so
+    # square corners pass through the origin; y holds the mask meanwhile
+    np.greater_equal(np.abs(x, out=y), 1e-9, out=y)
+    x *= y
+    _kernel(SHAPE_KERNELS, shape_influence, 'shape')(x, basis.theta, x, basis.decay)
+    np.multiply(x, basis.sin, out=y)
+    x *= basis.cos
+    if out is None:
+        x = x.astype(dtype or PRECISION, copy=False)
+        y = y.astype(dtype or PRECISION, copy=False)
+    if is_3d:
+        return x, y, basis.z.astype(x.dtype, copy=False)
+    return x, y
+
+
+# Working memory allowed per batch chunk (bytes)
+BATCH_MEMORY_CAP = 64 * 1024 * 1024
+
+
+def _batch_chunk_rows(points, max_bytes, dtype):
+    # sine waves and radius rows are live at once inside a chunk
+    return max(1, int(max_bytes // (2 * np.dtype(dtype).itemsize * points)))
+
+
+def _batch_keys(multipliers, shape_influences, axis_influence, axis_multipliers):
+    # One (shape code, multiplier, axis multiplier) row per requested pattern
+    multipliers = np.asarray(multipliers, dtype=float).ravel()
+    count = len(multipliers)
+    if shape_influences is None or isinstance(shape_influences, str):
+        shape_influences = [shape_influences] * count
+    names = list(SHAPE_KERNELS)
+    shape_codes = []
+    for shape in shape_influences:
+        _kernel(SHAPE_KERNELS, shape, 'shape')
+        shape_codes.append(names.index(shape))
+    if len(shape_codes) != count:
+        raise ValueError("shape_influences must match multipliers in length")
+    _kernel(AXIS_KERNELS, axis_influence, 'axis')
+    if axis_multipliers is None:
+        # Column left at 0; the axis kernel gets None (see _batch_radii)
+        axis_multipliers = np.zeros(count)
+    else:
+        axis_multipliers = np.broadcast_to(np.asarray(axis_multipliers, dtype=float), (count,))
+    return np.column_stack([shape_codes, multipliers, axis_multipliers])
+
+
+def _batch_radii(keys, axis_influence, has_axis_multipliers, grid, dtype):
+    # Radius rows for distinct keys. Each distinct (multiplier, axis
+    # multiplier) wave goes through the axis kernel once, whole multipliers
+    # being harmonic table rows used in place, and every shape using it
+    # writes its radius row straight from the wave.
+    basis = theta_basis(*grid, dtype=dtype)
+    axis = _kernel(AXIS_KERNELS, axis_influence, 'axis')
+    waves, wave_rows = np.unique(keys[:, 1:], axis=0, return_inverse=True)
+    waves = [axis(np.empty_like(basis.theta), basis.theta, multiplier,
+                  axis_multiplier if has_axis_multipliers else None, lambda k: _harmonic_row(k, *grid, dtype))
+             for multiplier, axis_multiplier in waves]
+    shapes = list(SHAPE_KERNELS.values())
+    r = np.empty((len(keys), len(basis.theta)), basis.theta.dtype)
+    for row, code, wave in zip(r, keys[:, 0].astype(int), wave_rows.ravel()):
+        shapes[code](waves[wave], basis.theta, row, basis.decay)
+    return r
+
+
+def generate_batch(multipliers, shape_influences=None, axis_influence='spiral', axis_multipliers=None,
+                   theta_start=THETA_START, theta_stop=THETA_STOP, points=POINTS, is_3d=False,
+                   max_bytes=BATCH_MEMORY_CAP, out=None, dtype=None):
+    """Batch version of generate_spiral returning (N, points) stacks.
+
+    shape_influences is one label for every row or one label per row.
+    Identical radius rows are computed once, in broadcast chunks of at most
+    max_bytes, then projected once into the output and copied to every row
+    repeating them. Pass out=(x, y) to reuse buffers across calls. In 3D the z stack is a read-only
+    broadcast of the shared z grid.
+    """
+    keys = _batch_keys(multipliers, shape_influences, axis_influence, axis_multipliers)
+    count = len(keys)
+    unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    basis = theta_basis(theta_start, theta_stop, points, dtype)
+    dtype = basis.theta.dtype
+    step = _batch_chunk_rows(points, max_bytes, dtype)
+
+    if out is None:
+        x = np.empty((count, points), dtype)
+        y = np.empty((count, points), dtype)
+    else:
+        x, y = out
+    order = np.argsort(inverse, kind='stable')
+    bounds = np.searchsorted(inverse[order], np.arange(0, len(unique) + step, step))
+    for block, start in enumerate(range(0, len(unique), step)):
+        radii = _batch_radii(unique[start:start + step], axis_influence, axis_multipliers is not None,
+                             (theta_start, theta_stop, points), dtype)
+        # Each distinct row is projected once; repeats copy the projected row
+        source = key = None
+        for row in order[bounds[block]:bounds[block + 1]]:
+            if inverse[row] == key:
+                x[row] = x[source]
+                y[row] = y[source]
+                continue
+            source, key = row, inverse[row]
+            np.multiply(radii[key - start], basis.cos, out=x[row])
+            np.multiply(radii[key - start], basis.sin, out=y[row])
+    if is_3d:
+        return x, y, np.broadcast_to(basis.z, (count, points))
+    return x, y
+
+
+def iter_batch(multipliers, shape_influences=None, axis_influence='spiral', axis_multipliers=None,
+               theta_start=THETA_START, theta_stop=THETA_STOP, points=POINTS, max_bytes=BATCH_MEMORY_CAP,
+               dtype=None):
+    """Yield (row_start, x, y) blocks of the generate_batch stack.
+
+    Only one block of at most max_bytes is alive at a time, so arbitrarily
+    many patterns can be streamed to disk or a renderer.
+    """
+    keys = _batch_keys(multipliers, shape_influences, axis_influence, axis_multipliers)
+    step = _batch_chunk_rows(points, max_bytes, dtype or PRECISION)
+    names = list(SHAPE_KERNELS)
+    shapes = [names[int(code)] for code in keys[:, 0]]
+    for start in range(0, len(keys), step):
+        block = keys[start:start + step]
+        x, y = generate_batch(block[:, 1], shapes[start:start + step], axis_influence,
+                              block[:, 2] if axis_multipliers is not None else None,
+                              theta_start, theta_stop, points, max_bytes=max_bytes, dtype=dtype)
+        yield start, x, y
+
+
+def generate_window(multiplier, shape_influence=None, axis_influence='spiral', axis_multiplier=None,
+                    theta_start=THETA_START, theta_stop=THETA_STOP, points=POINTS, is_3d=False,
+                    z_origin=THETA_START, dtype=None):
+    """Return (x, y) or (x, y, z) over one window of a pattern's theta range.
+
+    For refining small parts of a pattern (e.g. deep zoom tiles): the grid
+    is built on the spot rather than through the theta basis cache, which
+    so many short-lived windows would flush. z carries on the whole
+    pattern's z, which is 0 at z_origin.
+    """
+    dtype = np.dtype(dtype or PRECISION)
+    theta = np.linspace(theta_start, theta_stop, points)
+    r = spiral_radius(theta, multiplier, shape_influence, axis_influence, axis_multiplier)
+    x = (r * np.cos(theta)).astype(dtype, copy=False)
+    y = (r * np.sin(theta)).astype(dtype, copy=False)
+    if is_3d:
+        return x, y, ((theta - z_origin) * (Z_STOP / (THETA_STOP - THETA_START))).astype(dtype)
+    return x, y
+
+
+# Streaming: theta spacing of the standard grid, and points per yielded chunk
+THETA_STEP = (THETA_STOP - THETA_START) / (POINTS - 1)
+STREAM_CHUNK = 65536
+
+
+def stream_points(theta_start=THETA_START, theta_stop=THETA_STOP, step=THETA_STEP):
+    # How many vertices iter_spiral() yields over [theta_start, theta_stop]
+    return int(np.floor((theta_stop - theta_start) / step + 1e-9)) + 1
+
+
+def iter_spiral(multiplier, shape_influence=None, axis_influence='spiral', axis_multiplier=None,
+                theta_start=THETA_START, theta_stop=None, step=THETA_STEP, chunk=STREAM_CHUNK,
+                is_3d=False, dtype=None):
+    """Yield consecutive (x, y) or (x, y, z) chunks of one pattern.
+
+    Samples theta_start + i * step up to theta_stop, or forever when
+    theta_stop is None, chunk points at a time, so memory stays constant
+    however long the spiral is. Chunks do not overlap; a consumer drawing
+    a continuous line carries the last vertex over. z climbs Z_STOP every
+    THETA_STOP - THETA_START radians, like the scripts' 3D patterns.
+    """
+    dtype = np.dtype(dtype or PRECISION)
+    total = None
+    if theta_stop is not None:
+        total = stream_points(theta_start, theta_stop, step)
+    index = np.arange(chunk, dtype=float)
+    theta = np.empty(chunk)
+    z_rate = Z_STOP / (THETA_STOP - THETA_START)
+    start = 0
+    while total is None or start < total:
+        count = chunk if total is None else min(chunk, total - start)
+        t = theta[:count]
+        np.add(index[:count], start, out=t)
+        t *= step
+        t += theta_start
+        r = spiral_radius(t, multiplier, shape_influence, axis_influence, axis_multiplier)
+        x = (r * np.cos(t)).astype(dtype, copy=False)
+        y = (r * np.sin(t)).astype(dtype, copy=False)
+        if is_3d:
+            yield x, y, ((t - theta_start) * z_rate).astype(dtype)
+        else:
+            yield x, y
+        start += count
+
+
+# Density mode: histogram bins as (rows of y, columns of x)
+DENSITY_SHAPE = (512, 512)
+
+
+def accumulate_density(counts, x, y, bounds):
+    """Add the points (x, y) into counts, a histogram over bounds ((min, max) of x and y).
+
+    Points outside bounds are dropped. It is one np.bincount per call, so
+    binning a stream chunk by chunk (e.g. from iter_spiral) keeps memory at
+    one chunk plus counts however many points go through.
+    """
+    rows, columns = counts.shape
+    (x_min, x_max), (y_min, y_max) = bounds[:2]
+    column = (x - x_min) * (columns / (x_max - x_min))
+    row = (y - y_min) * (rows / (y_max - y_min))
+    keep = (column >= 0) & (column < columns) & (row >= 0) & (row < rows)
+    index = row[keep].astype(np.intp) * columns + column[keep].astype(np.intp)
+    counts += np.bincount(index, minlength=counts.size).reshape(counts.shape)
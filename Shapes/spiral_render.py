@@ -0,0 +1,802 @@
+import time
+from collections import OrderedDict
+
+import numpy as np
+from matplotlib.collections import LineCollection
+from matplotlib.colors import LinearSegmentedColormap, LogNorm
+from mpl_toolkits.mplot3d.art3d import Line3D, Line3DCollection
+
+
+# Display tolerance in pixels for the level-of-detail decimation; None draws every vertex
+LOD_TOLERANCE = 0.5
+
+
+def lod_indices(screen, tolerance=LOD_TOLERANCE):
+    """Indices of the vertices to draw so the polyline moves under ~tolerance px.
+
+    screen is the (N, 2|3) curve in pixel units. A stride of k vertices
+    strays about k**2 * |second difference| / 8 from the curve, so each
+    vertex allows a stride of floor(sqrt(8 * tolerance / bend)) and a
+    vertex is kept every time the running sum of 1 / stride passes a whole
+    number. Straight runs shrink to a few vertices; sharp turns keep all
+    of theirs. The first and last vertices are always kept.
+    """
+    count = len(screen)
+    if count < 3:
+        return np.arange(count)
+    bend = np.zeros(count)
+    bend[1:-1] = np.linalg.norm(screen[2:] - 2 * screen[1:-1] + screen[:-2], axis=1)
+    # Widen by one vertex each way so a stride cannot stop just short of a turn
+    bend[1:] = np.maximum(bend[1:], bend[:-1])
+    bend[:-1] = np.maximum(bend[:-1], bend[1:])
+    # Strides are whole vertices, so round each one down
+    stride = np.floor(np.sqrt(8 * tolerance / np.maximum(bend, 1e-12)))
+    total = np.floor(np.cumsum(1 / np.maximum(stride, 1)))
+    keep = np.flatnonzero(np.diff(total) > 0) + 1
+    return np.unique(np.concatenate(([0], keep, [count - 1])))
+
+
+def pixel_scale(ax, is_3d):
+    # Pixels per data unit along each axis. In 3D the box fits the smaller
+    # side of the axes whichever way it is turned, so this never
+    # underestimates and holds for any rotation.
+    bbox = ax.bbox
+    if is_3d:
+        limits = (ax.get_xlim3d(), ax.get_ylim3d(), ax.get_zlim3d())
+        sizes = (min(bbox.width, bbox.height),) * 3
+    else:
+        limits = (ax.get_xlim(), ax.get_ylim())
+        sizes = (bbox.width, bbox.height)
+    return tuple(size / max(abs(high - low), 1e-12) for size, (low, high) in zip(sizes, limits))
+
+
+class LODLineCollection(LineCollection):
+    # Brings its pattern's level of detail up to date just before drawing
+    pattern = None
+
+    def draw(self, renderer):
+        if self.pattern is not None:
+            self.pattern.refresh_lod()
+        super().draw(renderer)
+
+
+class LODLine3DCollection(Line3DCollection):
+    # 3D axes project every collection before drawing any, so refresh there
+    pattern = None
+
+    def do_3d_projection(self):
+        if self.pattern is not None:
+            self.pattern.refresh_lod()
+        return super().do_3d_projection()
+
+
+class PatternCollection:
+    """One growing artist for a whole pattern.
+
+    The curve is split into one polyline per color, colored by segment
+    index like the scripts' colors[int(3 * i / len(x))], inside a single
+    LineCollection (Line3DCollection in 3D). reveal(count) shows the first
+    count vertices by re-slicing those polylines, so a frame costs the
+    same however many patterns are locked on the axes. Dot trails use one
+    marker-only line per color instead.
+
+    data is (x, y[, z]) or an (N, 2|3) vertex array. A pattern that is
+    still being generated passes filled (how many vertices are valid so
+    far, grown with extend()) and the bounds ((min, max) per axis) to
+    scale the view to. bounds is kept as an (axes, 2) array so zooming
+    never has to scan the vertices.
+
+    Lines are drawn at screen resolution: only the lod_indices() vertices
+    for lod_tolerance pixels at the current axes size and limits. The
+    decimation is redone lazily at the next draw after a resize or zoom
+    (3D rotation does not change it), and is skipped while the figure is
+    being saved, so exports and the vertex arrays keep full resolution.
+    """
+
+    def __init__(self, ax, data, colors, dotted=False, linewidth=None, markersize=1, bounds=None, filled=None,
+                 lod_tolerance=LOD_TOLERANCE):
+        self.ax = ax
+        self.points = data if isinstance(data, np.ndarray) and data.ndim == 2 else np.column_stack(data)
+        self.filled = len(self.points) if filled is None else filled
+        self.colors = list(colors)
+        self.dotted = dotted
+        self.is_3d = self.points.shape[1] == 3
+        self.bands = self._bands()
+        self.count = 0
+        self.lod_tolerance = None if dotted else lod_tolerance
+        self.lod = None
+        self.lod_key = None
+        if dotted:
+            empty = [[]] * self.points.shape[1]
+            self.artists = [ax.plot(*empty, 'o', color=color, markersize=markersize)[0] for color in self.colors]
+        else:
+            collection = (LODLine3DCollection if self.is_3d else LODLineCollection)([], linewidths=linewidth)
+            collection.pattern = self
+            ax.add_collection(collection, autolim=False)
+            self.artists = [collection]
+        # Scale to the whole pattern up front so the view does not creep while it grows
+        self._autoscale(bounds)
+
+    def _autoscale(self, bounds=None):
+        if bounds is None:
+            bounds = np.column_stack((self.points.min(axis=0), self.points.max(axis=0)))
+        self.bounds = np.asarray(bounds, dtype=float)
+        if self.is_3d:
+            self.ax.auto_scale_xyz(*self.bounds, had_data=True)
+        else:
+            self.ax.update_datalim(self.bounds.T)
+            self.ax.autoscale_view()
+
+    def __len__(self):
+        return len(self.points)
+
+    def _bands(self):
+        edges = np.linspace(0, len(self.points), len(self.colors) + 1).astype(int)
+        return list(zip(edges[:-1], edges[1:]))
+
+    def replace(self, data):
+        # Swap in new vertices (e.g. the same pattern under another influence),
+        # keeping the artists and the revealed fraction; copied into the
+        # vertex array in place when the grid is the same
+        fraction = self.count / len(self.points) if len(self.points) else 0.0
+        if len(data) == self.points.shape[1] and len(data[0]) == len(self.points) and self.points.flags.writeable:
+            for axis, array in enumerate(data):
+                self.points[:, axis] = array
+        else:
+            self.points = np.column_stack(data)
+        self.filled = len(self.points)
+        self.bands = self._bands()
+        self.lod = self.lod_key = None
+        self._autoscale()
+        return self.reveal(round(fraction * len(self.points)))
+
+    def extend(self, block):
+        # Append an (n, 2|3) block of newly generated vertices
+        self.points[self.filled:self.filled + len(block)] = block
+        self.filled += len(block)
+
+    def refresh_lod(self):
+        # Recompute the decimation when the pixel scale has changed; patterns
+        # still being generated and figures being saved draw every vertex
+        if self.lod_tolerance is None:
+            return
+        full = self.filled < len(self.points) or self.ax.figure.canvas.is_saving()
+        key = None if full else pixel_scale(self.ax, self.is_3d)
+        if key == self.lod_key:
+            return
+        self.lod_key = key
+        self.lod = None if full else lod_indices(self.points * key, self.lod_tolerance)
+        self.reveal(self.count)
+
+    def _polyline(self, start, stop):
+        # Vertices start..stop - 1, decimated but always with both ends
+        if self.lod is None:
+            return self.points[start:stop]
+        inner = self.lod[np.searchsorted(self.lod, start + 1):np.searchsorted(self.lod, stop - 1)]
+        return self.points[np.concatenate(([start], inner, [stop - 1]))]
+
+    def polylines(self):
+        # The revealed curve at full resolution as ([polyline per band], [color per band])
+        bands = [(self.points[start:min(stop + 1, self.count)], color)
+                 for (start, stop), color in zip(self.bands, self.colors) if self.count - start >= 2]
+        return [polyline for polyline, _ in bands], [color for _, color in bands]
+
+    def reveal(self, count):
+        # Show the first count vertices; returns the artists that changed
+        count = max(0, min(int(count), self.filled))
+        self.count = count
+        if self.dotted:
+            for artist, (start, stop) in zip(self.artists, self.bands):
+                band = self.points[start:max(start, min(stop, count))]
+                if self.is_3d:
+                    artist.set_data_3d(*band.T)
+                else:
+                    artist.set_data(*band.T)
+        else:
+            # Each polyline runs one vertex into the next band so the curve stays joined
+            segments = [self._polyline(start, min(stop + 1, count)) for start, stop in self.bands if count - start >= 2]
+            self.artists[0].set_segments(segments)
+            self.artists[0].set_color(self.colors[:len(segments)])
+        return self.artists
+
+    def remove(self):
+        for artist in self.artists:
+            if artist.axes is not None:
+                artist.remove()
+
+
+# Default pacing for FrameScheduler
+TARGET_FPS = 30
+DRAW_DURATION = 3.0
+# Display refresh rate RefreshThrottle limits view updates to
+REFRESH_RATE = 60
+
+
+def union_bounds(*bounds):
+    # Smallest (axes, 2) bounds covering all the given ones; None entries are skipped
+    bounds = [b for b in bounds if b is not None]
+    if not bounds:
+        return None
+    stacked = np.stack(bounds)
+    return np.column_stack((stacked[:, :, 0].min(axis=0), stacked[:, :, 1].max(axis=0)))
+
+
+class RefreshThrottle:
+    """Call callback at most once per display refresh.
+
+    A widget callback (e.g. Slider.on_changed) can fire for every mouse
+    event. The first call goes through at once; calls during the next
+    1 / rate seconds are coalesced, and the latest of them runs when that
+    time is up, so the final value is never lost. With leading=False even
+    the first call waits for the end of its refresh, so a burst of calls
+    (e.g. set_xlim then set_ylim) runs the callback once.
+    """
+
+    def __init__(self, canvas, callback, rate=REFRESH_RATE, leading=True):
+        self.callback = callback
+        self.leading = leading
+        self.cooling = False
+        self.latest = None
+        self.timer = canvas.new_timer(interval=max(1, int(1000 / rate)))
+        self.timer.single_shot = True
+        self.timer.add_callback(self._expire)
+
+    def __call__(self, *args):
+        self.latest = args
+        if not self.cooling:
+            self.cooling = True
+            self.timer.start()
+            if self.leading:
+                self._run()
+
+    def _run(self):
+        args, self.latest = self.latest, None
+        self.callback(*args)
+
+    def _expire(self):
+        self.cooling = False
+        if self.latest is None:
+            return
+        if self.leading:
+            self(*self.latest)
+        else:
+            self._run()
+
+    def cancel(self):
+        self.timer.stop()
+        self.cooling = False
+        self.latest = None
+
+
+class ProjectedCollection(LineCollection):
+    """Many 3D polylines drawn as one 2D LineCollection on a 3D axes.
+
+    mplot3d projects each 3D artist on its own. Here every polyline
+    add()ed shares one (N, 3) vertex buffer, which is projected with a
+    single matrix multiply by the axes' projection matrix (so with its
+    elevation, azimuth, roll and zoom) only when the view has changed; the
+    2D polylines handed to the collection are views into the result.
+    Like PatternCollection it draws the lod_indices() of each polyline
+    for the current pixel scale, and every vertex while being saved. Add
+    it with ax.add_collection(collection, autolim=False).
+    """
+
+    def __init__(self, lod_tolerance=LOD_TOLERANCE, **kwargs):
+        super().__init__([], **kwargs)
+        self.lod_tolerance = lod_tolerance
+        self.vertices = np.empty((0, 3))
+        self.offsets = np.zeros(1, int)
+        self.line_colors = []
+        self.lod_key = ()
+        self.shown = None
+        self.shown_offsets = None
+        self.projected = None
+        self.projected_with = None
+        self.depth = np.nan
+
+    def add(self, polylines, colors):
+        polylines = [np.asarray(polyline, dtype=float) for polyline in polylines]
+        if not polylines:
+            return
+        self.vertices = np.concatenate([self.vertices] + polylines)
+        self.offsets = np.concatenate((self.offsets, self.offsets[-1] + np.cumsum([len(p) for p in polylines])))
+        self.line_colors.extend(colors)
+        self.set_color(self.line_colors)
+        self.lod_key = ()
+        self.stale = True
+
+    def polylines(self):
+        return np.split(self.vertices, self.offsets[1:-1]), list(self.line_colors)
+
+    def _refresh_lod(self):
+        full = self.lod_tolerance is None or self.axes.figure.canvas.is_saving()
+        key = None if full else pixel_scale(self.axes, True)
+        if key == self.lod_key:
+            return
+        self.lod_key = key
+        if full:
+            self.shown, self.shown_offsets = self.vertices, self.offsets
+        else:
+            keep = [start + lod_indices(self.vertices[start:stop] * key, self.lod_tolerance)
+                    for start, stop in zip(self.offsets[:-1], self.offsets[1:])]
+            self.shown = self.vertices[np.concatenate(keep)] if keep else self.vertices
+            self.shown_offsets = np.concatenate(([0], np.cumsum([len(k) for k in keep]))).astype(int)
+        # Stored as rows of x, y and z: multiplying (4, 3) by (3, N) is the
+        # fast way round, and the divide then runs over contiguous rows
+        self.shown = np.ascontiguousarray(self.shown.T)
+        self.projected = np.empty((4, self.shown.shape[1]))
+        self.projected_with = None
+
+    def do_3d_projection(self):
+        self._refresh_lod()
+        matrix = self.axes.M
+        if self.projected_with is None or not np.array_equal(matrix, self.projected_with):
+            # Homogeneous coordinates into the reused buffer, then the perspective divide
+            projected = np.matmul(matrix[:, :3], self.shown, out=self.projected)
+            projected += matrix[:, 3:]
+            projected[:3] /= projected[3]
+            self.set_segments(np.split(projected[:2].T, self.shown_offsets[1:-1]))
+            self.depth = projected[2].min() if projected.shape[1] else np.nan
+            self.projected_with = matrix.copy()
+        return self.depth
+
+
+# Vertices the rotate proxy draws in all, however many patterns are on the axes
+PROXY_POINTS = 20000
+
+
+class RotateProxy:
+    """Stand in for a 3D axes' lines with a decimated copy while it is dragged.
+
+    mplot3d re-projects every vertex of every artist on each mouse move of
+    a rotate or zoom drag. From a press inside a 3D axes of figure until
+    the release, the axes' lines (Line3D artists, PatternCollection lines
+    and ProjectedCollections) are hidden and drawn instead by one Line3DCollection, plus one
+    marker line per dotted artist, of at most points vertices in all. On
+    release the originals come back at full detail. Animated artists
+    (e.g. a pattern BlitAnimator is still revealing) draw themselves and
+    are left alone. It listens to the figure, so axes replaced later
+    (e.g. on a 2D/3D switch) are covered.
+    """
+
+    def __init__(self, figure, points=PROXY_POINTS):
+        self.figure = figure
+        self.points = points
+        self.proxies = []
+        self.hidden = []
+        canvas = figure.canvas
+        self.callbacks = [canvas.mpl_connect('button_press_event', self._press),
+                          canvas.mpl_connect('button_release_event', self._release)]
+
+    def _sources(self, ax):
+        # (artist, [(polyline, color, linewidth, marker, markersize)]) for everything shown on ax
+        for artist in ax.lines:
+            if artist.get_visible() and not artist.get_animated():
+                polyline = np.column_stack(artist.get_data_3d())
+                yield artist, [(polyline, artist.get_color(), artist.get_linewidth(),
+                                artist.get_marker() if artist.get_linestyle() == 'None' else None,
+                                artist.get_markersize())]
+        for artist in ax.collections:
+            # PatternCollection lines, and ProjectedCollections
+            source = artist if getattr(artist, 'pattern', None) is None else artist.pattern
+            if hasattr(source, 'polylines') and artist.get_visible() and not artist.get_animated():
+                linewidth = artist.get_linewidth()[0]
+                polylines, colors = source.polylines()
+                yield artist, [(polyline, color, linewidth, None, None) for polyline, color in zip(polylines, colors)]
+
+    def _press(self, event):
+        ax = event.inaxes
+        if ax is None or ax.name != '3d' or self.proxies:
+            return
+        sources = list(self._sources(ax))
+        parts = [part for _, artist_parts in sources for part in artist_parts]
+        total = sum(len(part[0]) for part in parts)
+        if total <= self.points:
+            return
+        stride = -(-total // self.points)
+        lines = [part for part in parts if part[3] is None]
+        if lines:
+            collection = Line3DCollection([np.concatenate((polyline[::stride], polyline[-1:]))
+                                           for polyline, _, _, _, _ in lines],
+                                          colors=[part[1] for part in lines], linewidths=[part[2] for part in lines])
+            ax.add_collection(collection, autolim=False)
+            self.proxies.append(collection)
+        for polyline, color, _, marker, markersize in parts:
+            if marker is not None:
+                # add_artist rather than plot(), which would rescale the axes
+                self.proxies.append(ax.add_artist(Line3D(*polyline[::stride].T, linestyle='None', marker=marker,
+                                                         color=color, markersize=markersize)))
+        for artist, _ in sources:
+            # Hidden Line3Ds still project themselves in every draw; animated
+            # ones are left out of it. Collections are projected unless hidden.
+            if isinstance(artist, Line3D):
+                self.hidden.append((artist, artist.set_animated, False))
+                artist.set_animated(True)
+            else:
+                self.hidden.append((artist, artist.set_visible, True))
+                artist.set_visible(False)
+
+    def _release(self, event):
+        if not self.proxies:
+            return
+        for proxy in self.proxies:
+            proxy.remove()
+        for artist, restore, state in self.hidden:
+            restore(state)
+        self.proxies = []
+        self.hidden = []
+        self.figure.canvas.draw_idle()
+
+
+# Deep zoom: tiles the theta range is cut into at base density, the most
+# doublings of that density it refines to, and how many vertices it keeps cached
+DEEP_ZOOM_TILES = 200
+DEEP_ZOOM_LEVELS = 8
+DEEP_ZOOM_CACHE = 2 ** 20
+
+
+class DeepZoom:
+    """Draw the part of a pattern in view at a density matching the zoom.
+
+    Zoomed in 2**level times past the pattern's own bounds, its theta range
+    is cut into tiles * 2**level tiles of as many vertices as a base tile,
+    i.e. 2**level times the base density. Only the tiles whose base facets
+    reach into the view are generated, with generate(theta_start,
+    theta_stop, points) -> (x, y[, z]), and drawn in one collection in
+    place of the pattern's artists; the rest of the curve is culled.
+    Tiles are cached, least recently used out first once over
+    cache_points vertices, so zooming back and forth does not regenerate
+    them.
+
+    theta is the theta of each of the pattern's vertices. Any change of
+    the axes limits schedules an update() within one refresh. A pattern
+    that is not fully revealed is always drawn as it is.
+    """
+
+    def __init__(self, pattern, theta, generate, tiles=DEEP_ZOOM_TILES, levels=DEEP_ZOOM_LEVELS,
+                 cache_points=DEEP_ZOOM_CACHE):
+        self.pattern = pattern
+        self.generate = generate
+        self.levels = levels
+        self.cache_points = cache_points
+        self.cache = OrderedDict()
+        self.cached = 0
+        self.hits = 0
+        self.misses = 0
+        self.theta = np.asarray(theta)
+        self.tiles = tiles
+        self.tile_points = int(np.ceil(len(theta) / tiles)) + 1
+        self.facets = None
+        self.shown = None
+        ax = pattern.ax
+        self.collection = (Line3DCollection if pattern.is_3d else LineCollection)([])
+        self.collection.set_visible(False)
+        ax.add_collection(self.collection, autolim=False)
+        self.throttle = RefreshThrottle(ax.figure.canvas, self._refresh, leading=False)
+        names = ('xlim_changed', 'ylim_changed', 'zlim_changed') if pattern.is_3d else ('xlim_changed', 'ylim_changed')
+        self.callbacks = [ax.callbacks.connect(name, lambda _: self.throttle()) for name in names]
+
+    def _limits(self):
+        ax = self.pattern.ax
+        if self.pattern.is_3d:
+            return np.array([ax.get_xlim3d(), ax.get_ylim3d(), ax.get_zlim3d()])
+        return np.array([ax.get_xlim(), ax.get_ylim()])
+
+    def level(self, limits=None):
+        # How many doublings of the base density the view needs
+        limits = self._limits() if limits is None else limits
+        spans = np.abs(limits[:, 1] - limits[:, 0])
+        home = self.pattern.bounds[:, 1] - self.pattern.bounds[:, 0]
+        zoom = np.max(home / np.maximum(spans, 1e-12))
+        return int(np.clip(np.round(np.log2(max(zoom, 1.0))), 0, self.levels))
+
+    def visible_tiles(self, level, limits=None):
+        limits = self._limits() if limits is None else limits
+        if self.facets is None:
+            # Each base facet's box, padded by half its length since the
+            # refined curve can bow out of the straight facet
+            points = self.pattern.points
+            pad = np.linalg.norm(np.diff(points, axis=0), axis=1)[:, None] / 2
+            self.facets = (np.minimum(points[:-1], points[1:]) - pad, np.maximum(points[:-1], points[1:]) + pad)
+        low, high = self.facets
+        inside = np.all((high >= limits.min(axis=1)) & (low <= limits.max(axis=1)), axis=1)
+        # Mark the tiles each of those facets' theta interval overlaps
+        count = self.tiles << level
+        scale = count / (self.theta[-1] - self.theta[0])
+        first = np.clip(((self.theta[:-1][inside] - self.theta[0]) * scale).astype(int), 0, count - 1)
+        last = np.clip(((self.theta[1:][inside] - self.theta[0]) * scale).astype(int), 0, count - 1)
+        marks = np.bincount(first, minlength=count + 1) - np.bincount(last + 1, minlength=count + 1)
+        return np.flatnonzero(np.cumsum(marks[:-1]) > 0)
+
+    def tile(self, tile, level):
+        key = (tile, level)
+        block = self.cache.get(key)
+        if block is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return block
+        self.misses += 1
+        width = (self.theta[-1] - self.theta[0]) / (self.tiles << level)
+        data = self.generate(self.theta[0] + tile * width, self.theta[0] + (tile + 1) * width, self.tile_points)
+        block = np.column_stack(data[:self.pattern.points.shape[1]])
+        self.cache[key] = block
+        self.cached += len(block)
+        while self.cached > self.cache_points and len(self.cache) > 1:
+            self.cached -= len(self.cache.popitem(last=False)[1])
+        return block
+
+    def update(self):
+        # Redo the tiles for the current view; True when the display changed
+        pattern = self.pattern
+        limits = self._limits()
+        level = self.level(limits) if pattern.count >= len(pattern) else 0
+        if level == 0:
+            if self.shown is None:
+                return False
+            self.shown = None
+            self.collection.set_visible(False)
+            for artist in pattern.artists:
+                artist.set_visible(True)
+            return True
+        tiles = self.visible_tiles(level, limits)
+        if self.shown is not None and self.shown[0] == level and np.array_equal(self.shown[1], tiles):
+            return False
+        segments, bands = self._segments(tiles, level)
+        self.collection.set_segments(segments)
+        self.collection.set_color([pattern.colors[band] for band in bands])
+        self.collection.set_visible(True)
+        for artist in pattern.artists:
+            artist.set_visible(False)
+        self.shown = (level, tiles)
+        return True
+
+    def _segments(self, tiles, level):
+        # The tiles' polylines with their color bands. The pattern's bands
+        # are colored by vertex index, so their edges are found in theta
+        # and a tile crossing one is cut there.
+        width = (self.theta[-1] - self.theta[0]) / (self.tiles << level)
+        edges = self.theta[[start for start, _ in self.pattern.bands[1:]]]
+        starts = self.theta[0] + tiles * width
+        bands = np.searchsorted(edges, starts, side='right')
+        crossed = set(((edges - self.theta[0]) / width).astype(int))
+        segments = []
+        segment_bands = []
+        for tile, start, band in zip(tiles, starts, bands):
+            block = self.tile(tile, level)
+            cuts = []
+            if tile in crossed:
+                cuts = np.ceil((edges[edges > start] - start) / width * (len(block) - 1)).astype(int)
+                cuts = [cut for cut in cuts if 0 < cut < len(block) - 1]
+            for first, last in zip([0] + cuts, cuts + [len(block) - 1]):
+                segments.append(block[first:last + 1])
+                segment_bands.append(band)
+                band += 1
+        return segments, segment_bands
+
+    def _refresh(self):
+        if self.update():
+            self.pattern.ax.figure.canvas.draw_idle()
+
+    def remove(self):
+        for cid in self.callbacks:
+            self.pattern.ax.callbacks.disconnect(cid)
+        self.throttle.cancel()
+        if self.collection.axes is not None:
+            self.collection.remove()
+        for artist in self.pattern.artists:
+            artist.set_visible(True)
+
+
+# Seconds between redraws of a density image that is still filling in
+DENSITY_REFRESH = 0.25
+
+
+class DensityImage:
+    """A density histogram shown as one image artist.
+
+    counts holds rows of y by columns of x over bounds ((min, max) of x
+    and y). Counts are log-scaled through a colormap blended from colors,
+    and empty bins stay transparent so the axes background shows through.
+    update() re-reads counts, which may still be filling in on another
+    thread.
+    """
+
+    def __init__(self, ax, counts, bounds, colors):
+        self.ax = ax
+        self.counts = counts
+        cmap = LinearSegmentedColormap.from_list('density', list(colors)).with_extremes(bad=(0, 0, 0, 0))
+        self.norm = LogNorm(vmin=1, vmax=2)
+        (x_min, x_max), (y_min, y_max) = bounds[:2]
+        self.image = ax.imshow(np.ma.masked_all(counts.shape), origin='lower', extent=(x_min, x_max, y_min, y_max),
+                               cmap=cmap, norm=self.norm, interpolation='nearest')
+        self.artists = [self.image]
+        self.update()
+
+    def update(self):
+        counts = self.counts.copy()
+        self.norm.vmax = max(int(counts.max()), 2)
+        self.image.set_data(np.ma.masked_equal(counts, 0, copy=False))
+
+    def remove(self):
+        if self.image.axes is not None:
+            self.image.remove()
+
+
+class FrameScheduler:
+    """Paces a reveal to finish in duration seconds at up to target_fps.
+
+    Progress follows the wall clock, so a slow frame is followed by a
+    bigger step and the frames in between are dropped instead of the
+    animation falling behind. The timer period stretches to the measured
+    draw time whenever frames cannot keep up with target_fps.
+    """
+
+    def __init__(self, target_fps=TARGET_FPS, duration=DRAW_DURATION, smoothing=0.3):
+        self.period = 1.0 / target_fps
+        self.duration = duration
+        self.smoothing = smoothing
+        self.draw_time = 0.0
+        self.origin = None
+        self.first = None
+        self.last = None
+        self.frames = 0
+
+    def begin(self, count, total, now):
+        # Start (or resume) the clock as if count vertices were already on time
+        self.origin = now - self.duration * count / max(total, 1)
+
+    def target(self, total, now):
+        # Vertices due when this frame reaches the screen, one draw time from now
+        if self.duration <= 0:
+            return total
+        return int(np.ceil(total * min(1.0, (now + self.draw_time - self.origin) / self.duration)))
+
+    def record(self, now, seconds):
+        if self.first is None:
+            self.first = now
+            self.draw_time = seconds
+        self.draw_time += self.smoothing * (seconds - self.draw_time)
+        self.last = now
+        self.frames += 1
+
+    @property
+    def interval(self):
+        # Timer period in ms: the target period, or the draw time when that is longer
+        return max(1, int(round(1000 * max(self.period, self.draw_time))))
+
+    @property
+    def dropped(self):
+        # Frames target_fps would have shown that were skipped to stay on time
+        if self.first is None:
+            return 0
+        return max(0, int((self.last - self.first) / self.period) + 1 - self.frames)
+
+
+class BlitAnimator:
+    """Reveal a PatternCollection from the canvas timer, blitting each frame.
+
+    Everything but the pattern is drawn once into a cached background (and
+    recached on every full redraw, e.g. a resize or a button click); each
+    tick restores it, draws only the pattern's artists and blits. Canvases
+    that cannot blit get a full draw_idle() per tick instead. fps and
+    frame_time report the measured rate once frames have been shown.
+
+    Each tick reveals step more vertices, or as many as scheduler (a
+    FrameScheduler) says are due, retuning the timer from its draw times.
+    feed, if given, is called first on every tick to extend() a pattern
+    that is still being generated; frames never run ahead of it.
+    """
+
+    def __init__(self, pattern, step=None, interval=20, start=0, on_frame=None, on_finish=None, scheduler=None,
+                 feed=None):
+        self.pattern = pattern
+        self.feed = feed
+        self.step = max(1, int(step or len(pattern) // 100))
+        self.scheduler = scheduler
+        if scheduler is not None:
+            interval = scheduler.interval
+        self.on_frame = on_frame
+        self.on_finish = on_finish
+        self.figure = pattern.ax.figure
+        self.canvas = self.figure.canvas
+        self.background = None
+        self.frames = 0
+        self.draw_seconds = 0.0
+        self.started = None
+        self.finished = None
+        self.running = False
+        self.timer = self.canvas.new_timer(interval=interval)
+        self.timer.add_callback(self.frame)
+        self.draw_event = None
+        self.blit = self.canvas.supports_blit
+        pattern.reveal(start)
+
+    @property
+    def done(self):
+        return self.pattern.count >= len(self.pattern)
+
+    @property
+    def fps(self):
+        if self.frames < 2:
+            return 0.0
+        return (self.frames - 1) / ((self.finished or time.perf_counter()) - self.started)
+
+    @property
+    def frame_time(self):
+        return self.draw_seconds / self.frames if self.frames else 0.0
+
+    def start(self):
+        if self.running or self.done:
+            return
+        if self.blit:
+            for artist in self.pattern.artists:
+                artist.set_animated(True)
+            self.draw_event = self.canvas.mpl_connect('draw_event', self._on_draw)
+            self.canvas.draw()
+        if self.scheduler is not None:
+            self.scheduler.begin(self.pattern.count, len(self.pattern), time.perf_counter())
+        self.running = True
+        self.finished = None
+        self.timer.start()
+
+    def stop(self):
+        # Freeze where it is: the last blit stays on screen and the pattern
+        # joins the next full redraw, so stopping never draws
+        if not self.running:
+            return
+        self.running = False
+        self.timer.stop()
+        if self.blit:
+            self.canvas.mpl_disconnect(self.draw_event)
+        self.finished = time.perf_counter()
+        for artist in self.pattern.artists:
+            artist.set_animated(False)
+        self.background = None
+
+    def _on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_pattern()
+
+    def _draw_pattern(self):
+        ax = self.pattern.ax
+        for artist in self.pattern.artists:
+            if hasattr(artist, 'do_3d_projection'):
+                artist.do_3d_projection()
+            ax.draw_artist(artist)
+
+    def frame(self):
+        if not self.running:
+            return
+        begin = time.perf_counter()
+        if self.feed is not None:
+            self.feed()
+        if self.scheduler is None:
+            count = min(self.pattern.count + self.step, self.pattern.filled)
+        else:
+            count = min(self.scheduler.target(len(self.pattern), begin), self.pattern.filled)
+        if count <= self.pattern.count:
+            return
+        if self.started is None:
+            self.started = begin
+        if self.on_frame is not None:
+            self.on_frame(self.pattern.count)
+        self.pattern.reveal(count)
+        if not self.blit:
+            self.canvas.draw_idle()
+        elif self.background is None:
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self.background)
+            self._draw_pattern()
+            self.canvas.blit(self.figure.bbox)
+        elapsed = time.perf_counter() - begin
+        self.frames += 1
+        self.draw_seconds += elapsed
+        if self.scheduler is not None:
+            self.scheduler.record(begin, elapsed)
+            if self.scheduler.interval != self.timer.interval:
+                self.timer.interval = self.scheduler.interval
+        if self.done:
+            self.stop()
+            if self.on_finish is not None:
+                self.on_finish(self)
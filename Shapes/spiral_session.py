@@ -0,0 +1,341 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from spiral_engine import DENSITY_SHAPE, SpiralWorkspace, accumulate_density
+from spiral_render import DENSITY_REFRESH, BlitAnimator, DensityImage, FrameScheduler, PatternCollection
+
+
+class DrawTask:
+    """One pattern being drawn: its PatternCollection and the animator revealing it.
+
+    The pattern is also the render cursor: its vertices, colors and the
+    revealed count. pause() freezes it there and resume() carries on from
+    that vertex with no recomputation. cancel() is final; it is O(1) and
+    safe to call from any callback, any number of times. Work done for the
+    task elsewhere (e.g. on a worker thread) polls cancelled.
+    """
+
+    def __init__(self, pattern, animator, cancelled=None, producer=None):
+        self.pattern = pattern
+        self.animator = animator
+        self.cancelled = cancelled or threading.Event()
+        self.producer = producer
+
+    @property
+    def running(self):
+        return self.animator.running
+
+    @property
+    def paused(self):
+        return not (self.running or self.animator.done or self.cancelled.is_set())
+
+    def start(self):
+        if not self.cancelled.is_set():
+            self.animator.start()
+
+    def pause(self):
+        self.animator.stop()
+
+    def cancel(self):
+        self.cancelled.set()
+        self.animator.stop()
+
+
+class DensityTask:
+    """One pattern binned into a DensityImage instead of drawn vertex by vertex.
+
+    Same interface as DrawTask, with no pattern: a canvas timer shows the
+    counts every interval seconds while the accumulator fills them in, and
+    calls on_finish(task) once it has binned every chunk. pause() stops
+    the accumulator after its current chunk; resume() carries on from the
+    next one.
+    """
+
+    pattern = None
+
+    def __init__(self, accumulator, image, interval=DENSITY_REFRESH, on_finish=None):
+        self.accumulator = accumulator
+        self.image = image
+        self.cancelled = accumulator.cancelled
+        self.on_finish = on_finish
+        self.timer = image.ax.figure.canvas.new_timer(interval=int(1000 * interval))
+        self.timer.add_callback(self._refresh)
+
+    @property
+    def running(self):
+        return self.accumulator.running
+
+    @property
+    def paused(self):
+        return not (self.running or self.accumulator.done.is_set() or self.cancelled.is_set())
+
+    def start(self):
+        if not self.cancelled.is_set():
+            self.accumulator.start()
+            self.timer.start()
+
+    def pause(self):
+        self.accumulator.stop()
+        self.timer.stop()
+
+    def cancel(self):
+        self.cancelled.set()
+        self.timer.stop()
+
+    def _refresh(self):
+        done = self.accumulator.done.is_set()
+        self.image.update()
+        self.image.ax.figure.canvas.draw_idle()
+        if done:
+            self.timer.stop()
+            if self.on_finish is not None:
+                self.on_finish(self)
+
+
+class SpiralSession:
+    """Owns the drawing state of one figure; at most one DrawTask runs at a time.
+
+    draw() cancels the in-flight task before building the next one, so
+    NEXT PATTERN, RESUME or a dimension switch never nest draw loops.
+    Patterns regenerated on the UI thread (reshape()) are computed in the
+    session's SpiralWorkspace.
+    """
+
+    def __init__(self, scheduler=FrameScheduler, workspace=None):
+        self.scheduler = scheduler
+        self.workspace = workspace or SpiralWorkspace()
+        self.task = None
+
+    @property
+    def running(self):
+        return self.task is not None and self.task.running
+
+    @property
+    def pattern(self):
+        return self.task.pattern if self.task is not None else None
+
+    def cancel(self):
+        if self.task is not None:
+            self.task.cancel()
+
+    def pause(self):
+        if self.task is not None:
+            self.task.pause()
+
+    def resume(self):
+        # Continue the paused task; False when there is nothing to resume
+        if self.task is None or not self.task.paused:
+            return False
+        self.task.start()
+        return True
+
+    def reshape(self, basis, multiplier, shape_influence=None, axis_influence='spiral', axis_multiplier=None):
+        """Redo the current pattern under another influence on basis, the grid it was sampled on.
+
+        The vertices are generated into the workspace and copied into the
+        pattern's own array, so a run of influence changes allocates no
+        vertex arrays. Returns the pattern.
+        """
+        pattern = self.task.pattern
+        pattern.replace(self.workspace.generate_on(basis, multiplier, shape_influence, axis_influence,
+                                                   axis_multiplier, is_3d=pattern.is_3d))
+        return pattern
+
+    def draw(self, ax, data, colors, dotted=False, start=0, play=True, on_frame=None, on_finish=None):
+        self.cancel()
+        pattern = PatternCollection(ax, data, colors, dotted=dotted)
+        animator = BlitAnimator(pattern, start=start, scheduler=self.scheduler(),
+                                on_frame=on_frame, on_finish=on_finish)
+        self.task = DrawTask(pattern, animator)
+        if play:
+            self.task.start()
+        return self.task
+
+    def stream(self, ax, chunks, points, bounds, colors, dotted=False, play=True, queue_size=8,
+               on_frame=None, on_finish=None):
+        """Like draw(), but the vertices come from chunks on a worker thread.
+
+        chunks yields (x, y[, z]) blocks adding up to points vertices (e.g.
+        spiral_engine.iter_spiral); the UI timer only drains the bounded
+        queue into the pattern and reveals what has arrived.
+        """
+        self.cancel()
+        cancelled = threading.Event()
+        producer = ChunkProducer(chunks, queue_size, cancelled)
+        pattern = PatternCollection(ax, np.zeros((points, len(bounds))), colors, dotted=dotted,
+                                    bounds=bounds, filled=0)
+
+        def feed():
+            for block in producer.drain():
+                pattern.extend(block)
+
+        animator = BlitAnimator(pattern, scheduler=self.scheduler(), on_frame=on_frame, on_finish=on_finish,
+                                feed=feed)
+        self.task = DrawTask(pattern, animator, cancelled, producer)
+        producer.start()
+        if play:
+            self.task.start()
+        return self.task
+
+    def density(self, ax, chunks, bounds, colors, shape=DENSITY_SHAPE, accumulate=False, play=True,
+                on_finish=None):
+        """Like stream(), but the points are binned into one DensityImage.
+
+        A worker thread bins chunks into a shape histogram over bounds, so
+        memory stays at one chunk plus the histogram however many points
+        chunks yields. With accumulate the counts carry on from the current
+        density task on the same axes, whose image this one replaces.
+        """
+        previous = self.task
+        self.cancel()
+        counts = None
+        if accumulate and isinstance(previous, DensityTask) and previous.image.ax is ax:
+            previous.accumulator.join()
+            previous.image.remove()
+            counts = previous.accumulator.counts
+        accumulator = DensityAccumulator(chunks, bounds, shape, counts)
+        self.task = DensityTask(accumulator, DensityImage(ax, accumulator.counts, bounds, colors),
+                                on_finish=on_finish)
+        if play:
+            self.task.start()
+        return self.task
+
+
+class DensityAccumulator:
+    """Bins (x, y[, z]) chunks into a histogram on a worker thread.
+
+    counts only ever grows, so it can be shown at any time while the
+    worker fills it in; points and elapsed count what has been binned so
+    far. stop() halts the worker after its current chunk and start()
+    carries on with the next one; done is set once chunks run out.
+    """
+
+    def __init__(self, chunks, bounds, shape=DENSITY_SHAPE, counts=None, cancelled=None):
+        self.chunks = iter(chunks)
+        self.bounds = bounds
+        self.counts = np.zeros(shape, np.int64) if counts is None else counts
+        self.points = 0
+        self.elapsed = 0.0
+        self.cancelled = cancelled or threading.Event()
+        self.stopped = threading.Event()
+        self.done = threading.Event()
+        self.thread = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        self.join()
+        if self.done.is_set() or self.cancelled.is_set():
+            return
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._run, name='density', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def join(self):
+        if self.thread is not None:
+            self.thread.join()
+
+    def _run(self):
+        start = time.perf_counter()
+        while not (self.stopped.is_set() or self.cancelled.is_set()):
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                self.done.set()
+                break
+            accumulate_density(self.counts, chunk[0], chunk[1], self.bounds)
+            self.points += len(chunk[0])
+        self.elapsed += time.perf_counter() - start
+
+
+class ChunkProducer:
+    """Moves a chunk iterator onto a worker thread behind a bounded queue.
+
+    The worker stacks each (x, y[, z]) chunk into an (n, 2|3) block and
+    blocks while the queue is full, so a slow display holds back
+    generation instead of letting memory grow. It stops within poll
+    seconds once cancelled is set.
+    """
+
+    def __init__(self, chunks, maxsize=8, cancelled=None, poll=0.05):
+        self.chunks = chunks
+        self.queue = queue.Queue(maxsize)
+        self.cancelled = cancelled or threading.Event()
+        self.poll = poll
+        self.thread = threading.Thread(target=self._run, name='chunk-producer', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def _run(self):
+        for chunk in self.chunks:
+            block = np.column_stack(chunk)
+            while not self.cancelled.is_set():
+                try:
+                    self.queue.put(block, timeout=self.poll)
+                    break
+                except queue.Full:
+                    pass
+            if self.cancelled.is_set():
+                return
+
+    def drain(self):
+        # Everything produced so far, without waiting
+        blocks = []
+        while True:
+            try:
+                blocks.append(self.queue.get_nowait())
+            except queue.Empty:
+                return blocks
+
+
+class PatternPrefetcher:
+    """Keeps the next depth patterns computing on a worker thread.
+
+    generate(key) builds one pattern (e.g. arrays plus colors) for the
+    settings in key. take(key) hands out a prefetched pattern made with the
+    same key (a hit; it waits if that one is still being computed) or
+    generates one on the spot (a miss), then queues replacements. Patterns
+    prefetched for other settings are dropped.
+    """
+
+    def __init__(self, generate, depth=2):
+        self.generate = generate
+        self.depth = depth
+        self.pending = deque()
+        self.hits = 0
+        self.misses = 0
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prefetch')
+
+    def prefetch(self, key):
+        while self.pending and self.pending[0][0] != key:
+            self.pending.popleft()[1].cancel()
+        while len(self.pending) < self.depth:
+            self.pending.append((key, self.executor.submit(self.generate, key)))
+
+    def take(self, key):
+        while self.pending and self.pending[0][0] != key:
+            self.pending.popleft()[1].cancel()
+        if self.pending:
+            self.hits += 1
+            result = self.pending.popleft()[1].result()
+        else:
+            self.misses += 1
+            result = self.generate(key)
+        self.prefetch(key)
+        return result
+
+    def shutdown(self):
+        for _, future in self.pending:
+            future.cancel()
+        self.pending.clear()
+        self.executor.shutdown(wait=False)